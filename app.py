@@ -1,17 +1,17 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import re
+import glob
 import os
-from collections import Counter, defaultdict
-from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-import emoji
-import nltk
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.decomposition import LatentDirichletAllocation
+import re
+import shutil
+import sys
+import time
+import uuid
+
+# Add src to path to import the shared parser core
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from cache import ChatCache, content_hash
+import profiling
+from profiling import profile
 
 # --- Page Config ---
 st.set_page_config(
@@ -21,6 +21,12 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# --- Instrumentation ---
+# Every analysis block below is timed as a stage of this rerun; the stages
+# are logged as JSON lines and listed in the sidebar's Performance panel
+profiling.enable_logging(os.environ.get('WHATSAPP_LOG_LEVEL', 'INFO'))
+profiler = profiling.start()
+
 # --- Custom CSS ---
 st.markdown("""
 <style>
@@ -95,61 +101,137 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- Download NLTK data ---
-try:
-    nltk.data.find('sentiment/vader_lexicon.zip')
-except LookupError:
-    nltk.download('vader_lexicon', quiet=True)
-
-# --- Parser Function ---
-def parse_whatsapp_chat(file_content):
-    """Parses WhatsApp chat file content and returns a DataFrame."""
-    patterns = [
-        r'^\[(\d{2}/\d{2}/\d{2}, \d{2}:\d{2}:\d{2})\] (.*?): (.*)$',
-        r'^(\d{2}/\d{2}/\d{4}, \d{2}:\d{2}) - (.*?): (.*)$'
-    ]
-    
-    lines = file_content.decode('utf-8').split('\n')
-    data = []
-    message_buffer = []
-    date_str, author = None, None
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        
-        match = None
-        for p in patterns:
-            match = re.match(p, line)
-            if match:
-                break
-        
-        if match:
-            if author:
-                data.append([date_str, author, ' '.join(message_buffer)])
-            message_buffer = []
-            date_str = match.group(1)
-            author = match.group(2)
-            message = match.group(3)
-            message_buffer.append(message)
-        else:
-            if author:
-                message_buffer.append(line)
-
-    if author:
-        data.append([date_str, author, ' '.join(message_buffer)])
-
-    df = pd.DataFrame(data, columns=['DateTime', 'Author', 'Message'])
-    
-    df['temp_date'] = pd.to_datetime(df['DateTime'], format='%d/%m/%Y, %H:%M', errors='coerce')
-    mask = df['temp_date'].isna()
-    if mask.any():
-        df.loc[mask, 'temp_date'] = pd.to_datetime(df.loc[mask, 'DateTime'], format='%d/%m/%y, %H:%M:%S', errors='coerce')
-    df['DateTime'] = df['temp_date']
-    df.drop(columns=['temp_date'], inplace=True)
-    
-    return df
+# --- Result Cache ---
+# Streamlit reruns this script on every interaction, so the parsed chat and
+# every aggregate are cached per upload hash. Set WHATSAPP_CACHE_DIR to also
+# keep them on disk across restarts.
+@st.cache_resource
+def get_chat_cache():
+    return ChatCache(disk_dir=os.environ.get('WHATSAPP_CACHE_DIR'))
+
+def get_chat_hash(uploaded_file):
+    """Hashes an upload once per file and remembers it for later reruns."""
+    hashes = st.session_state.setdefault('chat_hashes', {})
+    if uploaded_file.file_id not in hashes:
+        hashes[uploaded_file.file_id] = content_hash(uploaded_file.getvalue())
+    return hashes[uploaded_file.file_id]
+
+UPLOAD_DIR = 'uploads'
+# Chats uploaded in corpus mode are registered in a corpus per session here
+# (see src/corpus.py); those of sessions idle for longer are deleted
+CORPUS_DIR = os.path.join(UPLOAD_DIR, 'corpus')
+CORPUS_IDLE_SECONDS = 24 * 3600
+# Leading bytes of an export naming its lineage (see get_upload_path)
+LINEAGE_BYTES = 4096
+# Matches shown per page of search results
+SEARCH_PAGE_SIZE = 20
+# Processes scoring sentiment; the server scores in-process unless
+# WHATSAPP_SENTIMENT_WORKERS asks for a pool
+SENTIMENT_WORKERS = int(os.environ.get('WHATSAPP_SENTIMENT_WORKERS', 1))
+
+def get_upload_path(uploaded_file):
+    """
+    Where an upload and its store are kept: uploads/<lineage>/<name>, the
+    lineage being a hash of the export's first LINEAGE_BYTES. Re-exports
+    of a chat start alike and share a store (only new messages are
+    parsed); different chats uploaded under one name do not.
+    """
+    paths = st.session_state.setdefault('upload_paths', {})
+    if uploaded_file.file_id not in paths:
+        lineage = content_hash(uploaded_file.getvalue()[:LINEAGE_BYTES])
+        paths[uploaded_file.file_id] = os.path.join(UPLOAD_DIR, lineage, uploaded_file.name)
+    return paths[uploaded_file.file_id]
+
+def load_chat(uploaded_file, chat_hash):
+    """
+    Brings the columnar store for this upload in uploads/ up to date and
+    returns (df, totals, search_index, word_index) without Meta AI
+    messages. A weekly re-export of a chat seen before only has its new
+    messages parsed. The indexes are read with the messages, so they always
+    describe the same export.
+    """
+    upload_path = get_upload_path(uploaded_file)
+    os.makedirs(os.path.dirname(upload_path), exist_ok=True)
+    df, totals = ingest(uploaded_file.getvalue(), store.store_path(upload_path), chat_hash)
+    with profile('load search index'):
+        search_index = search.SearchIndex.load(store.store_path(upload_path), len(df))
+    with profile('load word index'):
+        word_index = WordIndex.load(store.store_path(upload_path))
+
+    # Save uploaded file
+    with open(upload_path, 'wb') as f:
+        f.write(uploaded_file.getvalue())
+
+    # Filtering copies the frame, so only do it when there is something to drop
+    if 'Meta AI' in df['Author'].cat.categories:
+        keep = (df['Author'] != 'Meta AI').to_numpy()
+        df = df[keep].reset_index(drop=True)
+        df['Author'] = df['Author'].cat.remove_unused_categories()
+        search_index = search_index.select_rows(keep)
+    return df, totals.drop_authors(['Meta AI']), search_index, word_index.drop_authors(['Meta AI'])
+
+def fit_topics(df_text, model_path):
+    """
+    Loads the topic model saved next to the chat's store, folds in the
+    conversations it has not seen yet and saves it back.
+    """
+    model = TopicModel.load(model_path) or TopicModel()
+    model.update(df_text)
+    model.save(model_path)
+    return model.topics()
+
+def word_cloud_image(freqs):
+    """Renders word frequencies as a word cloud image array."""
+    from wordcloud import WordCloud
+    wc = WordCloud(width=800, height=400, background_color='white', colormap='viridis', max_words=200)
+    return wc.generate_from_frequencies(freqs).to_array()
+
+def memory_report(frames):
+    """Deep memory usage of every column of the given named DataFrames."""
+    rows = []
+    for name, frame in frames.items():
+        for col, nbytes in frame.memory_usage(deep=True, index=False).items():
+            rows.append((name, col, str(frame[col].dtype), nbytes / 2**20))
+    return pd.DataFrame(rows, columns=['Frame', 'Column', 'Type', 'MiB'])
+
+def row_count(*values):
+    """Length of the first DataFrame or Series among `values` (looking inside tuples)."""
+    for value in values:
+        if isinstance(value, tuple) and row_count(*value) is not None:
+            return row_count(*value)
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return len(value)
+    return None
+
+def escape_markdown(text):
+    """Escapes the characters Streamlit's markdown would interpret."""
+    return re.sub(r'([\\`*_{}\[\]()#+\-.!|~<>$:])', r'\\\1', text)
+
+def cached(name, func, *args):
+    """Computes `func(*args)` once per uploaded chat, timing it as a stage."""
+    with profile(name) as stage:
+        stage.cached = True
+        def compute():
+            stage.cached = False
+            return func(*args)
+        result = chat_cache.get(chat_hash, name, compute)
+        stage.rows = row_count(*args, result)
+    return result
+
+def latest(name, key, func, *args):
+    """
+    Computes `func(*args)` for the filter `key`, keeping only the latest
+    result of `name` per session. Every filter change would otherwise add
+    entries to the shared cache and evict the chat itself.
+    """
+    results = st.session_state.setdefault('latest_results', {})
+    with profile(name) as stage:
+        stage.cached = results.get(name, (None,))[0] == (chat_hash, key)
+        if not stage.cached:
+            results[name] = ((chat_hash, key), func(*args))
+        result = results[name][1]
+        stage.rows = row_count(*args, result)
+    return result
 
 # --- Helper Functions ---
 def get_talkativeness_rating(percentage):
@@ -159,24 +241,97 @@ def get_talkativeness_rating(percentage):
     elif percentage >= 5: return "🤫 Quiet"
     else: return "🤐 Very Quiet"
 
-def count_media(msg):
-    media = {'images': 0, 'videos': 0, 'gifs': 0, 'stickers': 0, 'voice': 0, 'links': 0, 'deleted': 0}
-    msg_lower = msg.lower()
-    if 'image omitted' in msg_lower: media['images'] = 1
-    if 'video omitted' in msg_lower: media['videos'] = 1
-    if 'gif omitted' in msg_lower: media['gifs'] = 1
-    if 'sticker omitted' in msg_lower: media['stickers'] = 1
-    if 'audio omitted' in msg_lower or 'ptt omitted' in msg_lower: media['voice'] = 1
-    if 'http://' in msg or 'https://' in msg: media['links'] = 1
-    if 'this message was deleted' in msg_lower or 'you deleted this message' in msg_lower: media['deleted'] = 1
-    return media
+def show_table(data, key, format=None):
+    """Shows `data` one page of render.TABLE_PAGE_SIZE rows at a time."""
+    pages = max(1, -(-len(data) // render.TABLE_PAGE_SIZE))
+    number = 1
+    if pages > 1:
+        # The page count is part of the key, so a new selection starts on page 1
+        number = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                                 key=f'{key}_page_{pages}')
+    rows = render.page(data, number)
+    st.dataframe(rows.style.format(format) if format else rows, use_container_width=True, hide_index=True)
+
+def performance_panel():
+    """The sidebar's list of this rerun's stages; closes the rerun's profile."""
+    with st.sidebar:
+        with st.expander("⚡ Performance"):
+            stages = pd.DataFrame(profiler.report())
+            st.metric("This Rerun", f"{profiler.elapsed():.2f} s",
+                      help="Wall time of the script so far; chart rendering in the browser is not included")
+            st.dataframe(stages.style.format({'Seconds': '{:.3f}', 'Rows': '{:,.0f}', 'Peak MiB': '{:.1f}'}, na_rep=''),
+                         use_container_width=True, hide_index=True)
+            st.caption("Peak MiB is the rise in process memory during a stage. Cached stages were served from the result cache.")
+    profiler.finish()
+
+def heatmap_figure(heatmap_data):
+    """Draws activity_heatmap() counts as a weekday-by-hour heatmap."""
+    pivot = heatmap_data.pivot(index='DayOfWeek', columns='Hour', values='Count').fillna(0)
+    pivot = pivot.reindex(DAYS_ORDER)
+    fig = px.imshow(pivot, 
+                    labels=dict(x="Hour of Day", y="Day of Week", color="Messages"),
+                    color_continuous_scale='Viridis',
+                    aspect='auto',
+                    text_auto=False) # Keep it clean
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#1a1d24'), 
+        height=350, 
+        xaxis_title='Hour of Day (0-23)', 
+        yaxis_title='',
+        margin=dict(l=0, r=0, t=20, b=0)
+    )
+    return fig
+
+def reply_network_figure(graph, max_edges=50):
+    """
+    Draws the `max_edges` heaviest edges of the reply adjacency matrix as a
+    circular network graph. Only their authors are drawn, so the figure
+    stays small however many people are in the chat.
+    """
+    edges = graph.stack()
+    edges = edges[edges > 0].sort_values(ascending=False, kind='stable').head(max_edges)
+    max_weight = edges.max() if not edges.empty else 1
+
+    authors = sorted({a for pair in edges.index for a in pair})
+    angles = np.linspace(0, 2 * np.pi, len(authors), endpoint=False)
+    pos = {a: (np.cos(t), np.sin(t)) for a, t in zip(authors, angles)}
+
+    fig = go.Figure()
+    for (src, dst), weight in edges.items():
+        (x0, y0), (x1, y1) = pos[src], pos[dst]
+        fig.add_trace(go.Scatter(
+            x=[x0, x1], y=[y0, y1], mode='lines', hoverinfo='text',
+            text=f"{src} ➔ {dst}: {weight:,}",
+            line=dict(width=1 + 7 * weight / max_weight, color='rgba(18, 140, 126, 0.5)')
+        ))
+    fig.add_trace(go.Scatter(
+        x=[pos[a][0] for a in authors], y=[pos[a][1] for a in authors],
+        mode='markers+text', text=authors, textposition='top center', hoverinfo='text',
+        marker=dict(size=14, color='#25D366', line=dict(width=1, color='#128C7E'))
+    ))
+    fig.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#1a1d24'), showlegend=False, height=450,
+        xaxis=dict(visible=False), yaxis=dict(visible=False, scaleanchor='x'),
+        margin=dict(l=0, r=0, t=20, b=0)
+    )
+    return fig
 
 # --- Sidebar ---
 with st.sidebar:
     st.markdown("# 🔍 Chat Analysis")
     st.markdown("---")
     
-    uploaded_file = st.file_uploader("📁 Upload WhatsApp Export", type=['txt'], help="Export from WhatsApp: Settings → Chats → Export Chat → Without Media")
+    mode = st.radio("Mode", ["Single chat", "Corpus"], horizontal=True, key='mode',
+                    help="Corpus mode analyzes several chats together, counting each person once across them")
+    if mode == "Corpus":
+        uploaded_files = st.file_uploader("📚 Upload WhatsApp Exports", type=['txt'], accept_multiple_files=True,
+                                          help="Export from WhatsApp: Settings → Chats → Export Chat → Without Media")
+        uploaded_file = None
+    else:
+        uploaded_file = st.file_uploader("📁 Upload WhatsApp Export", type=['txt'], help="Export from WhatsApp: Settings → Chats → Export Chat → Without Media")
+        uploaded_files = []
     
     st.markdown("---")
     st.markdown("### 📖 How to Export")
@@ -188,7 +343,7 @@ with st.sidebar:
     """)
 
 # --- Landing Page ---
-if uploaded_file is None:
+if uploaded_file is None and not uploaded_files:
     st.markdown("# 🔍 WhatsApp Chat Analysis")
     st.markdown("### Uncover hidden patterns in your conversations")
     st.markdown("---")
@@ -199,6 +354,7 @@ if uploaded_file is None:
     *   👥 User comparisons and rankings
     *   ⏰ Activity patterns by time and day
     *   💬 Response time analysis
+    *   📚 Several chats at once in corpus mode
     """)
     
     st.markdown("#### Getting Started:")
@@ -232,19 +388,170 @@ if uploaded_file is None:
     
     st.stop()
 
+# --- Analysis Modules ---
+# Imported only once there is a chat to analyze, so a fresh process paints
+# the landing page without loading pandas, Plotly or the analysis code.
+# NLTK, scikit-learn and wordcloud are imported later still, by the views
+# that use them.
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from parser import ingest
+import analysis
+from corpus import REGISTRY_FILE, Corpus
+import store
+from emojis import count_emojis, top_emojis
+import render
+import search
+import sentiment
+from sessions import Sessions
+from topics import TopicModel
+from words import WordIndex
+from totals import DAYS_ORDER
+
+def get_corpus():
+    """
+    This session's corpus in CORPUS_DIR/<session id>/: its chats, author
+    identities and aliases are never seen by other sessions. Starting one
+    deletes the corpora idle for more than CORPUS_IDLE_SECONDS.
+    """
+    if 'corpus_id' not in st.session_state:
+        st.session_state['corpus_id'] = uuid.uuid4().hex
+        for path in glob.glob(os.path.join(CORPUS_DIR, '*', '')):
+            try:
+                idle = time.time() - os.path.getmtime(os.path.join(path, REGISTRY_FILE))
+            except OSError:
+                continue
+            if idle > CORPUS_IDLE_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+    return Corpus(os.path.join(CORPUS_DIR, st.session_state['corpus_id']))
+
+# --- Corpus Mode ---
+# Every chat is registered once as a partition of the corpus with its
+# aggregates precomputed; the views merge those aggregates and never load
+# the messages of all chats together
+if uploaded_files:
+    corpus = get_corpus()
+    uploaded_chats = list(dict.fromkeys(os.path.splitext(u.name)[0] for u in uploaded_files))
+    with st.spinner("📚 Registering chats..."):
+        for upload in uploaded_files:
+            with profile(f'register {upload.name}'):
+                corpus.add(os.path.splitext(upload.name)[0], upload.getvalue(), get_chat_hash(upload))
+        # Chats taken out of the uploader leave the corpus too
+        for chat in set(corpus.chat_names) - set(uploaded_chats):
+            corpus.remove(chat)
+    
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown("### 🎛️ Filters")
+        selected = st.multiselect("💬 Chats", uploaded_chats, key='corpus_chats', placeholder="Every chat")
+    
+    # The selection's totals are scanned once and cached until one of its
+    # chats changes or an alias is added
+    chats = selected or uploaded_chats
+    chat_cache = get_chat_cache()
+    chat_hash = corpus.fingerprint(chats)
+    corpus_totals = cached('corpus_totals', corpus.totals, chats)
+    authors = corpus_totals.authors()
+    
+    with st.sidebar:
+        with st.expander("🪪 Merge Authors"):
+            st.caption("Names are matched case-insensitively and phone numbers by their digits. "
+                       "Merge the ones that still belong to one person.")
+            people = authors['Author'].tolist()
+            name = st.selectbox("Author", people, key='alias_name')
+            same_as = st.selectbox("Is the same person as", people, key='alias_target')
+            if st.button("Merge", disabled=not people or name == same_as):
+                corpus.alias(name, same_as)
+                st.rerun()
+    
+    st.markdown(f"# 📚 Corpus of {len(chats)} Chats")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("💬 Messages", f"{int(authors['Messages'].sum()):,}")
+    col2.metric("👥 People", f"{len(authors):,}")
+    col3.metric("🔗 In Several Chats", f"{int((authors['Chats'] > 1).sum()):,}")
+    span = corpus_totals.date_range()
+    col4.metric("🗓️ Since", pd.Timestamp(span[0]).strftime('%b %Y') if span else "N/A")
+    
+    st.markdown("### 💬 Chats")
+    chat_table = corpus.chats()
+    show_table(chat_table[chat_table['Chat'].isin(chats)], 'corpus_chats')
+    
+    st.markdown("### 👥 Messages per Person")
+    people_bars = render.top_n(authors, 'Author', 'Messages')
+    fig_people = px.bar(people_bars, x='Messages', y='Author', orientation='h',
+                        color='Messages', color_continuous_scale='Viridis', hover_data=['Chats'])
+    fig_people.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#1a1d24'), coloraxis_showscale=False,
+        yaxis=dict(categoryorder='total ascending'), xaxis_title='', yaxis_title='',
+        height=max(300, len(people_bars) * 40)
+    )
+    st.plotly_chart(fig_people, use_container_width=True)
+    show_table(authors, 'corpus_people')
+    
+    st.markdown("### 📈 Message Trend Over Time")
+    freq = render.time_frequency(*span) if span else 'M'
+    trend = render.downsample(corpus_totals.timeline(freq), 'Date', 'Messages')
+    st.caption(f"Messages per {render.FREQUENCY_NAMES[freq]}")
+    fig_trend = px.area(trend, x='Date', y='Messages', color_discrete_sequence=['#1f77b4'])
+    fig_trend.update_layout(
+        plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#1a1d24'), xaxis_title='', yaxis_title=''
+    )
+    st.plotly_chart(fig_trend, use_container_width=True)
+    
+    st.markdown("### 🔥 Activity Heatmap")
+    st.plotly_chart(heatmap_figure(corpus_totals.activity_heatmap()), use_container_width=True)
+    
+    st.markdown("### ⏱️ Response Times")
+    st.caption("Replies within each chat, merged per person across chats.")
+    resp_stats = cached('corpus_response_times', corpus.response_times, chats)
+    if not resp_stats.empty:
+        show_table(resp_stats, 'corpus_response_times', {c: '{:.2f}' for c in resp_stats.columns[1:-1]})
+    else:
+        st.info("Not enough data to calculate response times.")
+    
+    performance_panel()
+    st.stop()
+
 # --- Load and Parse Data ---
+chat_cache = get_chat_cache()
+chat_hash = get_chat_hash(uploaded_file)
 with st.spinner("🔍 Analyzing your chat..."):
-    df = parse_whatsapp_chat(uploaded_file.getvalue())
-    df = df[df['Author'] != 'Meta AI'].copy()
-    
-    # Save uploaded file
-    upload_dir = 'uploads'
-    os.makedirs(upload_dir, exist_ok=True)
-    with open(os.path.join(upload_dir, uploaded_file.name), 'wb') as f:
-        f.write(uploaded_file.getvalue())
+    df, totals, search_index, word_index = cached('chat_and_indexes', load_chat, uploaded_file, chat_hash)
 
-# Filter out system messages
-df_text = df[~df['Message'].str.contains('<Media omitted>|image omitted|video omitted|sticker omitted|audio omitted', case=False, na=False, regex=True)].copy()
+# Filter out media placeholders, deleted messages and system notices
+df_text = cached('df_text', analysis.text_messages, df)
+
+# --- Filters ---
+# Time charts slice the precomputed count cube, so filtering costs the same
+# however long the chat is
+with st.sidebar:
+    st.markdown("---")
+    st.markdown("### 🎛️ Filters")
+    participants = st.multiselect("👥 Participants", totals.user_counts()['User'].tolist(),
+                                  key='filter_authors', placeholder="Everyone")
+    start_date, end_date = None, None
+    date_span = totals.date_range()
+    if date_span is not None:
+        first_day, last_day = (pd.Timestamp(d).date() for d in date_span)
+        picked = st.date_input("📅 Date Range", value=(first_day, last_day), min_value=first_day,
+                               max_value=last_day, key='filter_dates')
+        # While a range is being picked only its first day is set
+        if len(picked) == 2 and picked != (first_day, last_day):
+            start_date, end_date = picked
+    st.caption("Filters apply to the message counts, trend, word cloud, activity charts and search.")
+
+    with st.expander("🧠 Memory Usage"):
+        memory = cached('memory_report', memory_report, {'Chat': df, 'Text Messages': df_text})
+        chat_mib = memory.loc[memory['Frame'] == 'Chat', 'MiB'].sum()
+        st.metric("Parsed Chat", f"{chat_mib:,.1f} MiB",
+                  help=f"{chat_mib * 2**20 / max(len(df), 1):,.0f} bytes per message")
+        st.dataframe(memory.style.format({'MiB': '{:.2f}'}), use_container_width=True, hide_index=True)
+
+view = totals.select(participants or None, start_date, end_date)
 
 # --- Header with key metrics ---
 st.markdown(f"# 🔍 {uploaded_file.name.replace('.txt', '').replace('WhatsApp Chat with ', '')}")
@@ -266,28 +573,28 @@ with col5:
 st.markdown("---")
 
 # --- Main Tabs ---
-tab1, tab2, tab3 = st.tabs(["📊 Overview", "⏰ Activity", "👥 Users"])
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["📊 Overview", "⏰ Activity", "👥 Users", "💭 Sentiment", "🧩 Topics", "🔎 Search"])
 
 # ============================================
 # TAB 1: OVERVIEW
 # ============================================
-with tab1:
+with tab1, profile('Overview tab'):
     st.markdown("## 📊 Message Overview")
     
     st.markdown("### 💬 Messages per User")
-    user_counts = df['Author'].value_counts().reset_index()
-    user_counts.columns = ['User', 'Messages']
-    user_counts['Percentage'] = (user_counts['Messages'] / user_counts['Messages'].sum() * 100).round(1)
+    user_counts = view.user_counts()
     user_counts['Rating'] = user_counts['Percentage'].apply(get_talkativeness_rating)
+    # The most active users get a bar each, everyone else shares one
+    user_bars = render.top_n(user_counts, 'User', 'Messages')
     
-    fig = px.bar(user_counts, x='Messages', y='User', orientation='h', 
+    fig = px.bar(user_bars, x='Messages', y='User', orientation='h', 
                  color='Messages', color_continuous_scale='Viridis',
-                 text=user_counts.apply(lambda x: f"{x['Messages']:,} ({x['Percentage']}%)", axis=1))
+                 text=user_bars.apply(lambda x: f"{x['Messages']:,} ({x['Percentage']:.1f}%)", axis=1))
     fig.update_layout(
         plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
         font=dict(color='#1a1d24'), showlegend=False, coloraxis_showscale=False,
         yaxis=dict(categoryorder='total ascending'),
-        height=max(300, len(user_counts) * 40),
+        height=max(300, len(user_bars) * 40),
         xaxis_title='', yaxis_title=''
     )
     fig.update_traces(textposition='outside')
@@ -296,12 +603,17 @@ with tab1:
     st.markdown("### 📋 User Statistics")
     stats_df = user_counts[['User', 'Messages', 'Percentage', 'Rating']].copy()
     stats_df['Percentage'] = stats_df['Percentage'].apply(lambda x: f"{x}%")
-    st.dataframe(stats_df, use_container_width=True, hide_index=True)
+    show_table(stats_df, 'user_stats')
     
     st.markdown("### 📈 Message Trend Over Time")
-    df['YearMonth'] = df['DateTime'].dt.to_period('M').astype(str)
-    monthly = df.groupby('YearMonth').size().reset_index(name='Messages')
-    fig_trend = px.area(monthly, x='YearMonth', y='Messages', 
+    # Days, weeks or months depending on the range, then at most render.MAX_POINTS points
+    trend_span = view.date_range()
+    freq = render.time_frequency(*trend_span) if trend_span else 'M'
+    timeline = view.timeline(freq)
+    trend = render.downsample(timeline, 'Date', 'Messages')
+    st.caption(f"Messages per {render.FREQUENCY_NAMES[freq]}"
+               + (f", {len(trend):,} of {len(timeline):,} points shown" if len(trend) < len(timeline) else ""))
+    fig_trend = px.area(trend, x='Date', y='Messages', 
                         color_discrete_sequence=['#1f77b4'])
     fig_trend.update_layout(
         plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
@@ -312,11 +624,9 @@ with tab1:
     st.markdown("---")
     
     st.markdown("### 😀 Emoji Analysis")
-    def extract_emojis(text): return [c for c in text if c in emoji.EMOJI_DATA]
-    all_emojis = [e for msg in df['Message'] for e in extract_emojis(msg)]
-    if all_emojis:
-        emoji_counts = Counter(all_emojis).most_common(10)
-        emoji_df = pd.DataFrame(emoji_counts, columns=['Emoji', 'Count'])
+    emoji_table = cached('emoji_table', count_emojis, df)
+    emoji_df = cached('emoji_counts', top_emojis, emoji_table)
+    if not emoji_df.empty:
         fig_emoji = px.bar(emoji_df, x='Count', y='Emoji', orientation='h',
                            color='Count', color_continuous_scale='Viridis')
         fig_emoji.update_layout(
@@ -325,48 +635,63 @@ with tab1:
             yaxis=dict(categoryorder='total ascending'), xaxis_title='', yaxis_title=''
         )
         st.plotly_chart(fig_emoji, use_container_width=True)
+        
+        st.markdown("#### ⭐ Favourite Emoji per User")
+        fav_df = cached('favourite_emojis', analysis.favourite_emojis, emoji_table)
+        show_table(fav_df, 'favourite_emojis')
     else:
         st.info("No emojis found in the chat.")
 
+    st.markdown("---")
+    
+    st.markdown("### ☁️ Word Cloud")
+    # The word index is kept per month, so the date range is widened to whole months
+    filters = dict(authors=participants or None,
+                   start=start_date.strftime('%Y-%m') if start_date else None,
+                   end=end_date.strftime('%Y-%m') if end_date else None)
+    filter_key = f"{sorted(participants)}:{filters['start']}:{filters['end']}"
+    freqs = latest('word_freqs', filter_key, lambda: word_index.frequencies(**filters))
+    if not freqs.empty:
+        st.image(latest('word_cloud', filter_key, word_cloud_image, freqs.head(200).to_dict()),
+                 use_container_width=True)
+        
+        st.markdown("#### 🔑 Top Keywords")
+        keywords = freqs.head(20).rename('Count').reset_index()
+        fig_words = px.bar(keywords, x='Count', y='Word', orientation='h',
+                           color='Count', color_continuous_scale='Viridis')
+        fig_words.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#1a1d24'), showlegend=False, coloraxis_showscale=False,
+            yaxis=dict(categoryorder='total ascending'), xaxis_title='', yaxis_title='',
+            height=max(300, len(keywords) * 25)
+        )
+        st.plotly_chart(fig_words, use_container_width=True)
+    else:
+        st.info("No words found for this selection.")
+
 # ============================================
 # TAB 2: ACTIVITY
 # ============================================
-with tab2:
+with tab2, profile('Activity tab'):
     st.markdown("## ⏰ Activity Patterns")
     
     st.markdown("### 🔥 Activity Heatmap")
-    df['Hour'] = df['DateTime'].dt.hour
-    df['DayOfWeek'] = df['DateTime'].dt.day_name()
-    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    
-    heatmap_data = df.groupby(['DayOfWeek', 'Hour']).size().reset_index(name='Count')
-    pivot = heatmap_data.pivot(index='DayOfWeek', columns='Hour', values='Count').fillna(0)
-    pivot = pivot.reindex(days_order)
+    heatmap_data = view.activity_heatmap()
     
     # Peak detection
-    peak_val = int(heatmap_data['Count'].max())
-    peak_row = heatmap_data[heatmap_data['Count'] == peak_val].iloc[0]
-    st.info(f"**Peak Engagement:** Most active on **{peak_row['DayOfWeek']}s** around **{peak_row['Hour']}:00** ({peak_val} messages).")
-
-    fig_heat = px.imshow(pivot, 
-                         labels=dict(x="Hour of Day", y="Day of Week", color="Messages"),
-                         color_continuous_scale='Viridis',
-                         aspect='auto',
-                         text_auto=False) # Keep it clean
-    fig_heat.update_layout(
-        plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
-        font=dict(color='#1a1d24'), 
-        height=350, 
-        xaxis_title='Hour of Day (0-23)', 
-        yaxis_title='',
-        margin=dict(l=0, r=0, t=20, b=0)
-    )
-    st.plotly_chart(fig_heat, use_container_width=True)
+    if not heatmap_data.empty:
+        peak_val = int(heatmap_data['Count'].max())
+        peak_row = heatmap_data[heatmap_data['Count'] == peak_val].iloc[0]
+        st.info(f"**Peak Engagement:** Most active on **{peak_row['DayOfWeek']}s** around **{peak_row['Hour']}:00** ({peak_val} messages).")
+    else:
+        st.info("No messages match the current filters.")
+
+    st.plotly_chart(heatmap_figure(heatmap_data), use_container_width=True)
     
     col1, col2 = st.columns(2)
     with col1:
         st.markdown("### ⏱️ Messages by Hour")
-        hourly = df.groupby('Hour').size().reset_index(name='Messages')
+        hourly = view.hourly_counts()
         fig_hour = px.bar(hourly, x='Hour', y='Messages', color='Messages',
                           color_continuous_scale='Viridis')
         fig_hour.update_layout(
@@ -378,8 +703,7 @@ with tab2:
     
     with col2:
         st.markdown("### 📅 Messages by Day")
-        daily = df.groupby('DayOfWeek').size().reindex(days_order).reset_index()
-        daily.columns = ['Day', 'Messages']
+        daily = view.daily_counts()
         fig_day = px.bar(daily, x='Day', y='Messages', color='Messages',
                          color_continuous_scale='Viridis')
         fig_day.update_layout(
@@ -392,30 +716,23 @@ with tab2:
 # ============================================
 # TAB 3: AUTHORS
 # ============================================
-with tab3:
+with tab3, profile('Users tab'):
     st.markdown("## 👥 User Analysis")
+    # Sorted and sessionized once; every view below reads from it
+    sessions = cached('sessions', Sessions.from_frame, df)
     
     # --- Response Time Analysis ---
     st.markdown("### ⏱️ Response Time Analysis")
-    df_resp = df.sort_values('DateTime').reset_index(drop=True)
-    df_resp['PrevAuthor'] = df_resp['Author'].shift(1)
-    df_resp['PrevTime'] = df_resp['DateTime'].shift(1)
-    
-    # A reply is from a different author within 1 hour
-    mask = (df_resp['Author'] != df_resp['PrevAuthor']) & (df_resp['PrevAuthor'].notna())
-    df_resp = df_resp[mask].copy()
-    df_resp['ResponseTimeMinutes'] = (df_resp['DateTime'] - df_resp['PrevTime']).dt.total_seconds() / 60
-    
-    # Filter out responses longer than 1 hour to avoid skewing (e.g. overnight)
-    df_resp = df_resp[df_resp['ResponseTimeMinutes'] <= 60]
-    
-    if not df_resp.empty:
-        resp_stats = df_resp.groupby('Author')['ResponseTimeMinutes'].agg(['mean']).reset_index()
-        resp_stats.columns = ['Author', 'Mean Response (min)']
-        resp_stats = resp_stats.sort_values('Mean Response (min)')
+    resp_stats = cached('response_times', analysis.response_times, df, sessions)
+    
+    if not resp_stats.empty:
+        # Charted for the authors with the most replies; the table has everyone
+        resp_bars = render.top_n(resp_stats, 'Author', 'Replies', others=None)
+        if len(resp_bars) < len(resp_stats):
+            st.caption(f"Charts show the {len(resp_bars)} authors with the most replies.")
         
         # Display as a bar chart for fast comparison
-        fig_resp = px.bar(resp_stats, x='Mean Response (min)', y='Author', orientation='h',
+        fig_resp = px.bar(resp_bars, x='Mean Response (min)', y='Author', orientation='h',
                           title="Mean Response Time (Lower is Faster)",
                           color='Mean Response (min)', color_continuous_scale='Viridis_r')
         fig_resp.update_layout(
@@ -425,26 +742,28 @@ with tab3:
         )
         st.plotly_chart(fig_resp, use_container_width=True)
         
-        # Table with mean stats
-        st.dataframe(resp_stats.style.format({'Mean Response (min)': '{:.2f}'}), 
-                     use_container_width=True, hide_index=True)
+        # Typical, slow and slowest replies per author
+        percentiles = resp_bars.melt(id_vars='Author', value_vars=['Median (min)', 'P90 (min)', 'P99 (min)'],
+                                      var_name='Percentile', value_name='Minutes')
+        fig_pct = px.bar(percentiles, x='Minutes', y='Author', color='Percentile', orientation='h',
+                         barmode='group', title="Response Time Percentiles",
+                         color_discrete_sequence=px.colors.sequential.Viridis[::3])
+        fig_pct.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#1a1d24'), legend_title_text='',
+            xaxis_title='Minutes', yaxis_title='', height=max(300, len(resp_bars) * 60)
+        )
+        st.plotly_chart(fig_pct, use_container_width=True)
+        
+        show_table(resp_stats, 'response_times', {c: '{:.2f}' for c in resp_stats.columns[1:-1]})
     else:
         st.info("Not enough data to calculate response times.")
 
     st.markdown("---")
     
     st.markdown("### 🔗 Top Interactions (Most Frequent Replies)")
-    interactions = defaultdict(int)
-    # Using the same logic as before but with the already calculated df_resp if possible, 
-    # but let's stick to the threshold logic for consistency
-    df_sort = df.sort_values('DateTime').reset_index(drop=True)
-    df_sort['Diff'] = df_sort['DateTime'].diff().dt.total_seconds()
-    REPLY_THRESHOLD = 120
-    for i in range(1, len(df_sort)):
-        if df_sort.loc[i, 'Author'] != df_sort.loc[i-1, 'Author'] and df_sort.loc[i, 'Diff'] <= REPLY_THRESHOLD:
-            interactions[f"{df_sort.loc[i, 'Author']} ➔ {df_sort.loc[i-1, 'Author']}"] += 1
-    
-    int_df = pd.DataFrame(interactions.items(), columns=['Interaction', 'Count']).sort_values('Count', ascending=False).head(10)
+    graph = cached('reply_graph', analysis.reply_graph, df, analysis.REPLY_THRESHOLD, sessions)
+    int_df = cached('interactions', analysis.interactions, df, 10, graph)
     
     if not int_df.empty:
         fig_int = px.bar(int_df, x='Count', y='Interaction', orientation='h',
@@ -455,15 +774,35 @@ with tab3:
             yaxis=dict(categoryorder='total ascending'), xaxis_title='', yaxis_title=''
         )
         st.plotly_chart(fig_int, use_container_width=True)
+        
+        st.markdown("### 🕸️ Reply Network")
+        st.plotly_chart(reply_network_figure(graph), use_container_width=True)
     else:
         st.info("Not enough interaction data found.")
     
+    st.markdown("### 📎 Media Breakdown")
+    media_df = cached('media_counts', analysis.media_counts, df)
+    media_cols = [c for c in media_df.columns if c != 'Author' and media_df[c].sum() > 0]
+    
+    if media_cols:
+        media_bars = render.top_n(media_df, 'Author', media_df[media_cols].sum(axis=1))
+        fig_media = px.bar(media_bars, x=media_cols, y='Author', orientation='h',
+                           color_discrete_sequence=px.colors.sequential.Viridis)
+        fig_media.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#1a1d24'), legend_title_text='',
+            yaxis=dict(categoryorder='total ascending'), xaxis_title='', yaxis_title='',
+            height=max(300, len(media_bars) * 40)
+        )
+        st.plotly_chart(fig_media, use_container_width=True)
+        show_table(media_df[['Author'] + media_cols], 'media_counts')
+    else:
+        st.info("No media, links or deleted messages found.")
+    
     st.markdown("### 🎤 Conversation Starters")
-    SILENCE_THRESHOLD = 7200
-    starters = df_sort[(df_sort['Diff'] > SILENCE_THRESHOLD) | (df_sort['Diff'].isna())]['Author'].value_counts().reset_index()
-    starters.columns = ['Author', 'Count']
+    starters = cached('starters', analysis.conversation_starters, df, sessions)
     
-    fig_starters = px.bar(starters, x='Count', y='Author', orientation='h',
+    fig_starters = px.bar(render.top_n(starters, 'Author', 'Count'), x='Count', y='Author', orientation='h',
                           color='Count', color_continuous_scale='Viridis')
     fig_starters.update_layout(
         plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
@@ -471,4 +810,134 @@ with tab3:
         yaxis=dict(categoryorder='total ascending'), xaxis_title='', yaxis_title=''
     )
     st.plotly_chart(fig_starters, use_container_width=True)
+    
+    st.markdown("### 🧵 Sessions")
+    st.caption(f"A session ends after {analysis.SILENCE_THRESHOLD // 3600} hours of silence.")
+    session_df = cached('session_table', sessions.session_table)
+    dated = session_df[session_df['Start'].notna()]
+    
+    if not dated.empty:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Sessions", f"{len(dated):,}")
+        col2.metric("Median Messages", f"{dated['Messages'].median():.0f}")
+        col3.metric("Median Length", f"{dated['Minutes'].median():.0f} min")
+        col4.metric("Single-Message", f"{(dated['Messages'] == 1).mean():.0%}")
+        
+        # Log-spaced bins: most sessions are short, a few run to thousands of messages
+        edges = np.unique(np.geomspace(1, dated['Messages'].max() + 1, 30).astype(int))
+        counts, edges = np.histogram(dated['Messages'], bins=edges)
+        hist = pd.DataFrame({'Messages': [f"{a}–{b - 1}" if b - 1 > a else f"{a}" for a, b in zip(edges[:-1], edges[1:])],
+                             'Sessions': counts})
+        fig_sessions = px.bar(hist, x='Messages', y='Sessions', title="Messages per Session",
+                              color='Sessions', color_continuous_scale='Viridis')
+        fig_sessions.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#1a1d24'), coloraxis_showscale=False, yaxis_title='Sessions'
+        )
+        st.plotly_chart(fig_sessions, use_container_width=True)
+    else:
+        st.info("No dated messages to group into sessions.")
+
+# ============================================
+# TAB 4: SENTIMENT
+# ============================================
+with tab4, profile('Sentiment tab'):
+    st.markdown("## 💭 Sentiment Analysis")
+    st.markdown("Scored with VADER, which is tuned for social media text (emojis, caps, slang).")
+    
+    # Scores are cached per chat, and per message text on disk across chats
+    scores = cached('sentiment_scores', sentiment.score_messages, df_text['Message'], SENTIMENT_WORKERS,
+                    os.path.join(UPLOAD_DIR, 'sentiment'))
+    
+    if len(scores):
+        st.markdown("### 😊 Average Sentiment per User")
+        user_sentiment = cached('author_sentiment', sentiment.author_sentiment, df_text, scores)
+        # Charted for the most active authors; an average of a few messages says little
+        activity = df_text['Author'].value_counts().reindex(user_sentiment['Author']).to_numpy()
+        fig_sent = px.bar(render.top_n(user_sentiment, 'Author', activity, others=None), x='Sentiment', y='Author', orientation='h',
+                          color='Sentiment', color_continuous_scale='RdBu', range_color=[-0.5, 0.5])
+        fig_sent.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#1a1d24'), coloraxis_showscale=False,
+            yaxis=dict(categoryorder='total ascending'), xaxis_title='Compound Score (-1 to 1)', yaxis_title=''
+        )
+        st.plotly_chart(fig_sent, use_container_width=True)
+        
+        st.markdown("### 📈 Sentiment Trend Over Time")
+        monthly_sent = cached('monthly_sentiment', sentiment.monthly_sentiment, df_text, scores)
+        fig_sent_time = px.line(render.downsample(monthly_sent, 'Month', 'Sentiment'), x='Month', y='Sentiment', markers=True,
+                                color_discrete_sequence=['#128C7E'])
+        fig_sent_time.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#1a1d24'), xaxis_title='', yaxis_title=''
+        )
+        st.plotly_chart(fig_sent_time, use_container_width=True)
+    else:
+        st.info("No text messages to score.")
+
+# ============================================
+# TAB 5: TOPICS
+# ============================================
+with tab5, profile('Topics tab'):
+    st.markdown("## 🧩 Conversation Topics")
+    st.markdown("Each conversation (messages between silences of 2+ hours) is a document; topics are found with online LDA.")
+    
+    model_path = os.path.join(store.store_path(get_upload_path(uploaded_file)), 'topics.pkl')
+    with st.spinner("🧩 Finding topics..."):
+        topics_df = cached('topics', fit_topics, df_text, model_path)
+    
+    if not topics_df.empty:
+        fig_topics = px.bar(topics_df, x='Share', y='Topic', orientation='h', hover_data=['Words'],
+                            color='Share', color_continuous_scale='Viridis')
+        fig_topics.update_layout(
+            plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#1a1d24'), coloraxis_showscale=False,
+            yaxis=dict(categoryorder='total ascending'), xaxis_title='Share of Conversations', yaxis_title=''
+        )
+        st.plotly_chart(fig_topics, use_container_width=True)
+        
+        st.dataframe(topics_df.style.format({'Share': '{:.1%}'}), use_container_width=True, hide_index=True)
+    else:
+        st.info("Not enough text to find topics.")
+
+# ============================================
+# TAB 6: SEARCH
+# ============================================
+with tab6, profile('Search tab'):
+    st.markdown("## 🔎 Search Messages")
+    
+    query = st.text_input("Search", key='search_query', placeholder='e.g. dinner "see you"',
+                          help='Messages containing every word; put a phrase in "quotes" to match it exactly.')
+    col1, col2 = st.columns(2)
+    with col1:
+        context = st.number_input("Context messages", min_value=0, max_value=5, value=2,
+                                  help="Messages shown before and after each match")
+    
+    if query.strip():
+        with profile('search') as stage:
+            hits = search.search(df, search_index, query, participants or None, start_date, end_date)
+            stage.rows = len(hits)
+        
+        pages = max(1, -(-len(hits) // SEARCH_PAGE_SIZE))
+        with col2:
+            # No key: a new result count makes a new widget, back on page 1
+            page = st.number_input("Page", min_value=1, max_value=pages, value=1)
+        st.caption(f"{len(hits):,} matching messages · {stage.seconds * 1000:.1f} ms")
+        
+        page_hits = hits[(page - 1) * SEARCH_PAGE_SIZE:page * SEARCH_PAGE_SIZE]
+        for _, group in search.with_context(df, page_hits, context).groupby('Hit', sort=True):
+            lines = []
+            for row in group.itertuples():
+                when = row.DateTime.strftime('%d %b %Y, %H:%M') if pd.notna(row.DateTime) else ''
+                text = f"**{escape_markdown(str(row.Author))}** · {when} — {escape_markdown(str(row.Message).replace(chr(10), ' '))}"
+                lines.append(f":green-background[{text}]" if row.Match else f":gray[{text}]")
+            with st.container(border=True):
+                st.markdown("  \n".join(lines))
+        
+        if not len(hits):
+            st.info("No messages match this search.")
+    else:
+        st.info("Type a word or a \"phrase\" to search the chat.")
 
+# --- Performance ---
+performance_panel()
@@ -0,0 +1,50 @@
+import pandas as pd
+from classify import DELETED, MEDIA_FLAGS, SYSTEM, flag_counts, message_flags
+from sessions import REPLY_THRESHOLD, SILENCE_THRESHOLD, Sessions
+
+# Messages with any of these flags have no text of their own
+NON_TEXT_FLAGS = MEDIA_FLAGS | DELETED | SYSTEM
+
+def text_messages(df):
+    """Returns the messages that are not media placeholders, deleted or system notices."""
+    return df[(message_flags(df) & NON_TEXT_FLAGS) == 0]
+
+def media_counts(df):
+    """Media, links, deleted messages and system notices per author."""
+    return flag_counts(df)
+
+def favourite_emojis(counts):
+    """Each author's most used emoji from count_emojis() output."""
+    per_author = counts.groupby(['Author', 'Emoji'], sort=False)['Count'].sum().reset_index()
+    per_author = per_author.sort_values('Count', ascending=False, kind='stable')
+    return per_author.drop_duplicates('Author').reset_index(drop=True)
+
+def response_times(df, sessions=None):
+    """Response time mean and percentiles per author, fastest first (see Sessions.response_times)."""
+    if sessions is None:
+        sessions = Sessions.from_frame(df)
+    return sessions.response_times()
+
+def reply_graph(df, threshold=REPLY_THRESHOLD, sessions=None):
+    """Weighted reply adjacency matrix of the chat (see Sessions.reply_graph)."""
+    if sessions is None:
+        sessions = Sessions.from_frame(df)
+    return sessions.reply_graph(threshold)
+
+def interactions(df, top=10, graph=None):
+    """The `top` most frequent 'A ➔ B' reply pairs."""
+    if graph is None:
+        graph = reply_graph(df)
+    counts = graph.stack()
+    counts = counts[counts > 0]
+    int_df = pd.DataFrame({
+        'Interaction': [f"{a} ➔ {b}" for a, b in counts.index],
+        'Count': counts.to_numpy(),
+    })
+    return int_df.sort_values('Count', ascending=False, kind='stable').head(top)
+
+def conversation_starters(df, sessions=None):
+    """How often each author breaks a silence longer than SILENCE_THRESHOLD."""
+    if sessions is None:
+        sessions = Sessions.from_frame(df)
+    return sessions.conversation_starters()
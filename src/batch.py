@@ -0,0 +1,190 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+import analysis
+import profiling
+from classify import classify
+from emojis import count_emojis, top_emojis
+from parser import parse_text
+from profiling import profile
+from sessions import Sessions
+from store import file_fingerprint
+from totals import ChatTotals
+
+# Written last for every finished chat; a chat without one is redone
+MANIFEST_FILE = 'manifest.json'
+REPORT_FILE = 'report.json'
+# Appended to with one summary line per batch run
+RUNS_FILE = 'runs.jsonl'
+FORMATS = ('json', 'parquet')
+# Authors left out of every report, as in the dashboard
+EXCLUDED_AUTHORS = ['Meta AI']
+
+def analyze_chat(df):
+    """
+    Runs the dashboard's analyses (all but sentiment and topics) on a
+    parsed chat and returns them as named DataFrames.
+    """
+    with profile('totals', len(df)):
+        totals = ChatTotals.from_frame(df)
+    with profile('emojis', len(df)):
+        emoji_table = count_emojis(df)
+    with profile('sessions', len(df)):
+        sessions = Sessions.from_frame(df)
+    with profile('response_times', len(df)):
+        response_times = analysis.response_times(df, sessions)
+    with profile('interactions', len(df)):
+        interactions = analysis.interactions(df, graph=analysis.reply_graph(df, sessions=sessions))
+    with profile('conversation_starters', len(df)):
+        starters = analysis.conversation_starters(df, sessions)
+    with profile('media_counts', len(df)):
+        media = analysis.media_counts(df)
+    return {
+        'user_counts': totals.user_counts(),
+        'monthly_counts': totals.monthly_counts(),
+        'activity_heatmap': totals.activity_heatmap(),
+        'hourly_counts': totals.hourly_counts(),
+        'daily_counts': totals.daily_counts(),
+        'response_times': response_times,
+        'interactions': interactions,
+        'conversation_starters': starters,
+        'session_stats': sessions.session_stats(),
+        'top_emojis': top_emojis(emoji_table),
+        'favourite_emojis': analysis.favourite_emojis(emoji_table),
+        'media_counts': media,
+    }
+
+def chat_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+def is_done(path, out_dir):
+    """Whether `out_dir` holds a finished report of the export at `path` as it is now."""
+    try:
+        with open(os.path.join(out_dir, chat_name(path), MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f)['fingerprint'] == file_fingerprint(path)
+    except (OSError, ValueError, KeyError):
+        return False
+
+def _write_json(obj, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+def process_chat(path, out_dir, formats=FORMATS):
+    """
+    Worker: parses one export, analyzes it and writes its reports to
+    out_dir/<chat>/. Returns the chat's summary, which is also written as
+    the manifest once everything else is on disk.
+    """
+    profiler = profiling.start()
+    with profile('parse') as stage:
+        with open(path, encoding='utf-8') as f:
+            df = parse_text(f.read())
+        stage.rows = len(df)
+    with profile('classify', len(df)):
+        df['Flags'] = classify(df['Message'])
+    if df['Author'].isin(EXCLUDED_AUTHORS).any():
+        df = df[~df['Author'].isin(EXCLUDED_AUTHORS)].reset_index(drop=True)
+        df['Author'] = df['Author'].cat.remove_unused_categories()
+    tables = analyze_chat(df)
+
+    chat_dir = os.path.join(out_dir, chat_name(path))
+    os.makedirs(chat_dir, exist_ok=True)
+    summary = {
+        'chat': chat_name(path),
+        'source': os.path.abspath(path),
+        'fingerprint': file_fingerprint(path),
+        'bytes': os.path.getsize(path),
+        'messages': len(df),
+        'participants': int(df['Author'].nunique()),
+        'first_message': df['DateTime'].min(),
+        'last_message': df['DateTime'].max(),
+    }
+    with profile('write', len(df)):
+        if 'parquet' in formats:
+            for name, table in tables.items():
+                table.to_parquet(os.path.join(chat_dir, f"{name}.parquet"), index=False)
+        if 'json' in formats:
+            report = dict(summary, tables={
+                name: json.loads(table.to_json(orient='records', date_format='iso', force_ascii=False))
+                for name, table in tables.items()
+            })
+            _write_json(report, os.path.join(chat_dir, REPORT_FILE))
+
+    summary['seconds'] = round(profiler.elapsed(), 4)
+    summary['stages'] = {s.name: round(s.seconds, 4) for s in profiler.stages}
+    _write_json(summary, os.path.join(chat_dir, MANIFEST_FILE))
+    return summary
+
+def run_batch(in_dir, out_dir, workers=None, formats=FORMATS, force=False):
+    """
+    Analyzes every .txt export in `in_dir` across `workers` processes
+    (None for all cores), skipping the ones already reported unless
+    `force`. Returns (summaries, failures).
+    """
+    paths = sorted(glob.glob(os.path.join(in_dir, '*.txt')))
+    todo = [p for p in paths if force or not is_done(p, out_dir)]
+    # Largest first, so one big chat does not start last and hold up the end
+    todo.sort(key=os.path.getsize, reverse=True)
+    print(f"{len(paths)} exports, {len(paths) - len(todo)} already done, {len(todo)} to analyze")
+    os.makedirs(out_dir, exist_ok=True)
+
+    summaries, failures = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_chat, p, out_dir, formats): p for p in todo}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                failures.append({'source': path, 'error': f"{type(e).__name__}: {e}"})
+                print(f"[{len(summaries) + len(failures)}/{len(todo)}] FAILED {chat_name(path)}: {e}")
+                continue
+            summaries.append(summary)
+            print(f"[{len(summaries) + len(failures)}/{len(todo)}] {summary['chat']}: "
+                  f"{summary['messages']:,} messages in {summary['seconds']:.2f}s")
+    return summaries, failures
+
+if __name__ == "__main__":
+    # Usage: python batch.py exports/ reports/ [--workers 4] [--format json,parquet] [--force]
+    cli = argparse.ArgumentParser(description="Analyzes a directory of WhatsApp exports without the dashboard.")
+    cli.add_argument('input', help="directory of .txt exports")
+    cli.add_argument('output', help="directory for the per-chat reports")
+    cli.add_argument('--workers', type=int, default=None, help="processes (default: all cores)")
+    cli.add_argument('--format', default=','.join(FORMATS), help="comma-separated: json, parquet")
+    cli.add_argument('--force', action='store_true', help="redo chats that already have a report")
+    args = cli.parse_args()
+
+    formats = [f for f in args.format.split(',') if f]
+    if set(formats) - set(FORMATS) or not formats:
+        cli.error(f"--format takes a comma-separated subset of {', '.join(FORMATS)}")
+
+    started = datetime.now(timezone.utc)
+    t0 = time.perf_counter()
+    summaries, failures = run_batch(args.input, args.output, args.workers, formats, args.force)
+    elapsed = time.perf_counter() - t0
+
+    messages = sum(s['messages'] for s in summaries)
+    megabytes = sum(s['bytes'] for s in summaries) / 2**20
+    run = {
+        'started': started.isoformat(timespec='seconds'),
+        'seconds': round(elapsed, 3),
+        'workers': args.workers or os.cpu_count(),
+        'chats': len(summaries),
+        'failed': failures,
+        'messages': messages,
+        'messages_per_second': round(messages / elapsed) if elapsed else None,
+        'megabytes_per_second': round(megabytes / elapsed, 2) if elapsed else None,
+    }
+    with open(os.path.join(args.output, RUNS_FILE), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run) + '\n')
+    print(f"{len(summaries)} chats, {messages:,} messages in {elapsed:.1f}s: "
+          f"{run['messages_per_second'] or 0:,} messages/s, {run['megabytes_per_second'] or 0} MB/s"
+          + (f", {len(failures)} failed" if failures else ""))
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+import analysis
+from classify import classify
+from emojis import count_emojis, emoji_regexes
+from profiling import PeakMemory
+from parser import decode_timestamps, detect_dialect, iter_records, parse_text, settle_day_order, SAMPLE_LINES
+from sentiment import score_messages
+from synthetic import PLATFORMS, generate_chat
+
+DEFAULT_SIZES = '10k,100k,1M,10M'
+STAGES = ['parse', 'datetime', 'classify', 'emojis', 'response_times', 'interactions', 'sentiment']
+
+def parse_size(text):
+    """'10k' -> 10000, '1M' -> 1000000."""
+    text = text.strip()
+    scale = {'k': 1_000, 'K': 1_000, 'm': 1_000_000, 'M': 1_000_000}.get(text[-1], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def synthetic_export(data_dir, n_messages, chat_platform, seed=0):
+    """Path of a generated export, generating it only the first time."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"chat-{chat_platform}-{n_messages}-{seed}.txt")
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        generate_chat(tmp_path, n_messages, platform=chat_platform, seed=seed)
+        os.replace(tmp_path, path)
+    return path
+
+def run_stages(path, stages=STAGES, workers=1):
+    """
+    Runs the pipeline stages on one export and yields (stage, seconds,
+    peak_rss_delta_bytes, rows). 'datetime' times the timestamp decoding
+    on its own, although 'parse' includes it as well.
+    """
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    dialect = settle_day_order(detect_dialect(text.split('\n', SAMPLE_LINES)[:SAMPLE_LINES]), text)
+    emoji_regexes()
+
+    def timed(stage, func):
+        with PeakMemory(collect=True) as mem:
+            t0 = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - t0
+        return result, (stage, elapsed, mem.delta)
+
+    df, row = timed('parse', lambda: parse_text(text, dialect))
+    if 'parse' in stages:
+        yield (*row, len(df))
+
+    if 'datetime' in stages:
+        # The raw timestamp strings exactly as the parser decodes them
+        raw = [record[0] for record in iter_records(text.split('\n'), dialect)]
+        _, row = timed('datetime', lambda: decode_timestamps(raw, dialect))
+        del raw
+        yield (*row, len(df))
+    del text
+
+    if 'classify' in stages:
+        df['Flags'], row = timed('classify', lambda: classify(df['Message']))
+        yield (*row, len(df))
+
+    df_text = analysis.text_messages(df)
+    if 'emojis' in stages:
+        _, row = timed('emojis', lambda: count_emojis(df))
+        yield (*row, len(df))
+    if 'response_times' in stages:
+        _, row = timed('response_times', lambda: analysis.response_times(df))
+        yield (*row, len(df))
+    if 'interactions' in stages:
+        _, row = timed('interactions', lambda: analysis.interactions(df))
+        yield (*row, len(df))
+    if 'sentiment' in stages:
+        _, row = timed('sentiment', lambda: score_messages(df_text['Message'], workers=workers))
+        yield (*row, len(df_text))
+
+if __name__ == "__main__":
+    # Usage: python benchmark.py [--sizes 10k,100k] [--platform ios] [--stages parse,emojis]
+    # Appends one JSON object per (size, stage) to the output file.
+    cli = argparse.ArgumentParser(description="Times and memory-profiles the pipeline on synthetic exports.")
+    cli.add_argument('--sizes', default=DEFAULT_SIZES, help=f"comma-separated message counts (default {DEFAULT_SIZES})")
+    cli.add_argument('--platform', choices=PLATFORMS + ('both',), default='both')
+    cli.add_argument('--stages', default=','.join(STAGES), help="comma-separated stages to run")
+    cli.add_argument('--workers', type=int, default=1, help="processes for sentiment scoring")
+    cli.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'whatsapp-bench'))
+    cli.add_argument('--output', default='bench_results.jsonl')
+    args = cli.parse_args()
+
+    stages = [s for s in args.stages.split(',') if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        cli.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    platforms = PLATFORMS if args.platform == 'both' else (args.platform,)
+    run = {
+        'run_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+    print(f"{'platform':<8} {'messages':>11} {'stage':<15} {'seconds':>9} {'msgs/s':>12} {'peak MiB':>9}")
+    with open(args.output, 'a', encoding='utf-8') as out:
+        for size in (parse_size(s) for s in args.sizes.split(',')):
+            for chat_platform in platforms:
+                path = synthetic_export(args.data_dir, size, chat_platform)
+                for stage, seconds, peak, rows in run_stages(path, stages, args.workers):
+                    result = dict(run, platform=chat_platform, messages=size, stage=stage, rows=rows,
+                                  seconds=round(seconds, 4), peak_rss_bytes=peak)
+                    out.write(json.dumps(result) + '\n')
+                    out.flush()
+                    print(f"{chat_platform:<8} {size:>11,} {stage:<15} {seconds:>9.3f} "
+                          f"{rows / seconds if seconds else 0:>12,.0f} {peak / 2**20:>9.1f}")
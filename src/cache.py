@@ -0,0 +1,117 @@
+import glob
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+# Number of (chat, result) entries kept in memory before evicting the oldest
+DEFAULT_MAX_ENTRIES = 64
+# Bytes of pickles kept in the disk tier before pruning the least recently used
+DEFAULT_MAX_DISK_BYTES = 2**30
+
+def content_hash(data):
+    """Returns a stable hex digest identifying the raw bytes of an export."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+class ChatCache:
+    """
+    Caches parsed chats and derived aggregates keyed by (content hash, name).
+    Results live in a bounded in-memory LRU; with `disk_dir` set they are
+    also pickled to disk so they survive process restarts and evictions,
+    up to `max_disk_bytes` of them.
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, disk_dir=None, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chat_hash, name, compute):
+        """
+        Returns the cached result for (chat_hash, name), calling `compute()`
+        and storing its result on a miss.
+        """
+        key = (chat_hash, name)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        value = self._load(key)
+        if value is None:
+            value = compute()
+            self._dump(key, value)
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        """Drops every in-memory entry (the disk tier is left untouched)."""
+        with self._lock:
+            self._entries.clear()
+
+    def _path(self, key):
+        chat_hash, name = key
+        # Names can be long or hold any character (filter keys list authors),
+        # so the file is named after their hash
+        return os.path.join(self.disk_dir, chat_hash, f"{content_hash(name.encode('utf-8'))}.pkl")
+
+    def _load(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            # The modification time orders entries for _prune
+            os.utime(path)
+            return value
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _dump(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        # Write to a temp file first so a crash never leaves a truncated entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The disk tier is best effort: the result is still cached in memory
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._prune()
+
+    def _prune(self):
+        """Deletes the least recently used disk entries beyond max_disk_bytes."""
+        entries = []
+        for path in glob.glob(os.path.join(self.disk_dir, '*', '*.pkl')):
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            entries.append((info.st_mtime, info.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                # Drops the chat's directory once its last entry is gone
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,325 @@
+import argparse
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from batch import EXCLUDED_AUTHORS, chat_name
+from cache import content_hash
+from parser import ingest
+from profiling import profile
+from sessions import Sessions, response_table
+from store import file_fingerprint, load_aggregate, load_index, save_aggregate
+from totals import DAYS_ORDER, binned_timeline, heatmap_table, weekday_of
+
+# A corpus directory holds every registered chat as its own partition,
+# chats/<content hash>/ (a chat store, see store.py, plus a responses.parquet
+# aggregate), and corpus.json: the chats, the global author identities and
+# the aliases merging them
+CHATS_DIR = 'chats'
+REGISTRY_FILE = 'corpus.json'
+REGISTRY_VERSION = 2
+# Chats registered with older aggregates are re-aggregated when added again
+AGGREGATE_VERSION = 2
+# Aggregates saved for the whole chat; the others are per-part indexes
+WHOLE_CHAT_AGGREGATES = ('responses',)
+
+# Direction marks WhatsApp puts around phone numbers
+_BIDI_MARKS = re.compile(r'[\u200e\u200f\u202a-\u202e\u2066-\u2069]')
+_PHONE_NUMBER = re.compile(r'\+?[\d\s().-]{7,}')
+
+def author_key(name):
+    """
+    The identity of an author name across chats: phone numbers by their
+    digits, other names case- and whitespace-insensitively.
+    """
+    name = _BIDI_MARKS.sub('', str(name)).strip()
+    if _PHONE_NUMBER.fullmatch(name):
+        return '+' + re.sub(r'\D', '', name)
+    return ' '.join(name.casefold().split())
+
+class CorpusTotals:
+    """
+    The stored (Author, Day, Hour, Count) totals of several chats, with a
+    Chat column and global author names. Every view is a grouped sum over
+    these rows, so memory grows with the number of non-empty cells rather
+    than with authors x days x 24 as a merged ChatTotals cube would.
+    """
+    def __init__(self, counts=None):
+        if counts is None:
+            counts = pd.DataFrame({'Chat': [], 'Author': [], 'Day': np.zeros(0, dtype=np.int32),
+                                   'Hour': np.zeros(0, dtype=np.int8), 'Count': np.zeros(0, dtype=np.int32)})
+        self.counts = counts
+        dated = counts['Hour'].to_numpy() >= 0
+        self._days = counts['Day'].to_numpy(np.int64)[dated]
+        self._hours = counts['Hour'].to_numpy(np.int64)[dated]
+        self._dated_counts = counts['Count'].to_numpy(np.int64)[dated]
+
+    def authors(self):
+        """Messages and number of chats per author, most active first."""
+        if self.counts.empty:
+            return pd.DataFrame({'Author': [], 'Messages': [], 'Chats': []})
+        authors = self.counts.groupby('Author').agg(Messages=('Count', 'sum'), Chats=('Chat', 'nunique'))
+        return authors.sort_values('Messages', ascending=False, kind='stable').reset_index()
+
+    def date_range(self):
+        """First and last day with messages as datetime64[D], or None if nothing is dated."""
+        if not len(self._days):
+            return None
+        return np.datetime64(int(self._days.min()), 'D'), np.datetime64(int(self._days.max()), 'D')
+
+    def timeline(self, freq='D'):
+        """Messages per day, week or month (see ChatTotals.timeline)."""
+        return binned_timeline(self._days, self._dated_counts, freq)
+
+    def _weekday_hours(self):
+        matrix = np.zeros((7, 24), dtype=np.int64)
+        np.add.at(matrix, (weekday_of(self._days), self._hours), self._dated_counts)
+        return matrix
+
+    def activity_heatmap(self):
+        """Message counts per (DayOfWeek, Hour) pair."""
+        return heatmap_table(self._weekday_hours())
+
+    def daily_counts(self):
+        """Number of messages per day of the week, Monday first."""
+        return pd.DataFrame({'Day': DAYS_ORDER, 'Messages': self._weekday_hours().sum(axis=1)})
+
+class Corpus:
+    """
+    Many chats analyzed together. Each chat is ingested once into its own
+    partition with its aggregates precomputed (the ChatTotals counts and
+    the response-time buckets), and every author is mapped to a global
+    identity, so the same person is counted once across chats. A query
+    over any subset of chats loads those aggregates partition by partition
+    in parallel and merges them; the messages themselves are never
+    concatenated.
+    """
+    def __init__(self, path, workers=None):
+        self.path = path
+        # Threads: partition scans are Parquet reads, which release the GIL
+        self.workers = workers
+        self.registry = self._read_registry()
+
+    def _read_registry(self):
+        try:
+            with open(os.path.join(self.path, REGISTRY_FILE), encoding='utf-8') as f:
+                registry = json.load(f)
+        except (OSError, ValueError):
+            registry = {}
+        if registry.get('version') != REGISTRY_VERSION:
+            registry = {'version': REGISTRY_VERSION, 'chats': {}, 'names': {}, 'aliases': {}}
+        return registry
+
+    def _write_registry(self):
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = os.path.join(self.path, f"{REGISTRY_FILE}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.registry, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, os.path.join(self.path, REGISTRY_FILE))
+
+    def _partition_path(self, partition):
+        return os.path.join(self.path, CHATS_DIR, partition)
+
+    def chat_path(self, chat):
+        return self._partition_path(self.registry['chats'][chat]['partition'])
+
+    def _shared(self, partition, chat):
+        """Whether a chat other than `chat` is stored in `partition`."""
+        return any(e['partition'] == partition for c, e in self.registry['chats'].items() if c != chat)
+
+    @property
+    def chat_names(self):
+        """Registered chats, in the order they were added."""
+        return list(self.registry['chats'])
+
+    def add(self, chat, data, fingerprint):
+        """
+        Registers (or brings up to date) the chat named `chat` from the
+        export bytes `data`, identified by `fingerprint`, and returns its
+        registry entry. Partitions are named after the content of the
+        export, so two chats uploaded under the same name never share one.
+        A re-export of a registered chat takes over its partition and only
+        has its new messages parsed (see parser.ingest).
+        """
+        previous = self.registry['chats'].get(chat)
+        if previous is not None and previous['fingerprint'] == fingerprint and previous.get('version') == AGGREGATE_VERSION:
+            return previous
+
+        partition = content_hash(data)
+        path = self._partition_path(partition)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        moved = previous is not None and previous['partition'] != partition
+        if moved and not os.path.isdir(path):
+            old_path = self._partition_path(previous['partition'])
+            if os.path.isdir(old_path):
+                if self._shared(previous['partition'], chat):
+                    shutil.copytree(old_path, path)
+                else:
+                    os.replace(old_path, path)
+        df, _ = ingest(data, path, fingerprint)
+        # Left out before sessionizing, as in the dashboard, so they do not
+        # split gaps or stand in as the message replied to
+        df = df[~df['Author'].isin(EXCLUDED_AUTHORS)].reset_index(drop=True)
+        with profile('responses', len(df)):
+            save_aggregate(Sessions.from_frame(df).response_aggregate(), path, 'responses')
+
+        authors = [a for a in df['Author'].cat.categories if a not in EXCLUDED_AUTHORS]
+        for author in authors:
+            self.registry['names'].setdefault(self.resolve(author), author)
+        entry = {
+            'version': AGGREGATE_VERSION,
+            'partition': partition,
+            'fingerprint': fingerprint,
+            'messages': len(df),
+            'authors': authors,
+            'first_message': str(df['DateTime'].min()),
+            'last_message': str(df['DateTime'].max()),
+        }
+        self.registry['chats'][chat] = entry
+        self._write_registry()
+        if moved and not self._shared(previous['partition'], chat):
+            shutil.rmtree(self._partition_path(previous['partition']), ignore_errors=True)
+        return entry
+
+    def add_file(self, file_path):
+        """Registers the export at `file_path` under its file name."""
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        return self.add(chat_name(file_path), data, file_fingerprint(file_path))
+
+    def remove(self, chat):
+        """Drops a chat and its partition from the corpus."""
+        partition = self.registry['chats'].pop(chat)['partition']
+        if not self._shared(partition, chat):
+            shutil.rmtree(self._partition_path(partition), ignore_errors=True)
+        self._write_registry()
+
+    def resolve(self, name):
+        """The global identity key of an author name, following aliases."""
+        key = author_key(name)
+        seen = set()
+        while key in self.registry['aliases'] and key not in seen:
+            seen.add(key)
+            key = self.registry['aliases'][key]
+        return key
+
+    def alias(self, name, same_as):
+        """Counts the author `name` as the same person as `same_as` from now on."""
+        target = self.resolve(same_as)
+        if author_key(name) == target:
+            return
+        self.registry['names'].setdefault(target, same_as)
+        self.registry['aliases'][author_key(name)] = target
+        self._write_registry()
+
+    def global_name(self, name):
+        """The name an author is shown under across the corpus."""
+        key = self.resolve(name)
+        return self.registry['names'].get(key, name)
+
+    def _check(self, chats):
+        chats = self.chat_names if chats is None else list(chats)
+        unknown = [c for c in chats if c not in self.registry['chats']]
+        if unknown:
+            raise KeyError(f"not in the corpus: {', '.join(unknown)}")
+        return chats
+
+    def _load_partition(self, chat, name):
+        """The `name` aggregate of one chat, its authors renamed to their global names."""
+        path = self.chat_path(chat)
+        frame = load_aggregate(path, name) if name in WHOLE_CHAT_AGGREGATES else load_index(path, name)
+        if frame is None:
+            return None
+        frame = frame[~frame['Author'].isin(EXCLUDED_AUTHORS)]
+        names = {a: self.global_name(a) for a in frame['Author'].unique()}
+        frame = frame.assign(Author=frame['Author'].map(names))
+        frame.insert(0, 'Chat', chat)
+        return frame
+
+    def scan(self, name, chats=None):
+        """
+        Loads the `name` aggregate ('totals' or 'responses') of every one of
+        `chats` (all by default) in parallel and returns them as one
+        DataFrame with a Chat column and global author names.
+        """
+        chats = self._check(chats)
+        with profile(f"scan {name}") as stage:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                frames = [f for f in pool.map(lambda c: self._load_partition(c, name), chats) if f is not None]
+            stage.rows = sum(len(f) for f in frames)
+        if not frames:
+            return None
+        return pd.concat(frames, ignore_index=True)
+
+    def fingerprint(self, chats=None):
+        """
+        Identifies the aggregates of `chats` (all by default) as they are
+        now: it changes when one of them is updated or an alias is added.
+        """
+        state = [[c, self.registry['chats'][c]['fingerprint']] for c in self._check(chats)]
+        state.append([self.registry['aliases'], self.registry['names']])
+        return content_hash(json.dumps(state, sort_keys=True).encode('utf-8'))
+
+    def totals(self, chats=None):
+        """The CorpusTotals of `chats` (all by default), by global author."""
+        return CorpusTotals(self.scan('totals', chats))
+
+    def response_times(self, chats=None):
+        """Sessions.response_times() by global author across `chats` (all by default)."""
+        buckets = self.scan('responses', chats)
+        if buckets is None:
+            return response_table(pd.DataFrame({'Author': [], 'Bucket': [], 'Count': [], 'Seconds': []}))
+        return response_table(buckets)
+
+    def authors(self, chats=None):
+        """Messages and number of chats per global author, most active first."""
+        return self.totals(chats).authors()
+
+    def chats(self):
+        """One row per registered chat: its messages, participants and date range."""
+        return pd.DataFrame({
+            'Chat': self.chat_names,
+            'Messages': [e['messages'] for e in self.registry['chats'].values()],
+            'Participants': [len(e['authors']) for e in self.registry['chats'].values()],
+            'First Message': pd.to_datetime([e['first_message'] for e in self.registry['chats'].values()]),
+            'Last Message': pd.to_datetime([e['last_message'] for e in self.registry['chats'].values()]),
+        })
+
+if __name__ == "__main__":
+    # Usage: python corpus.py corpus/ add exports/*.txt
+    #        python corpus.py corpus/ alias "+91 98765 43210" "Ravi"
+    #        python corpus.py corpus/ report [--chats a,b]
+    cli = argparse.ArgumentParser(description="Registers WhatsApp exports in a corpus and reports across them.")
+    cli.add_argument('corpus', help="corpus directory")
+    commands = cli.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help="register or update exports")
+    add.add_argument('exports', nargs='+', help=".txt exports")
+    alias = commands.add_parser('alias', help="count one author name as another")
+    alias.add_argument('name')
+    alias.add_argument('same_as')
+    report = commands.add_parser('report', help="print the aggregates of some or all chats")
+    report.add_argument('--chats', default=None, help="comma-separated chat names (default: all)")
+    report.add_argument('--workers', type=int, default=None, help="threads scanning partitions")
+    args = cli.parse_args()
+
+    corpus = Corpus(args.corpus, getattr(args, 'workers', None))
+    if args.command == 'add':
+        for path in args.exports:
+            entry = corpus.add_file(path)
+            print(f"{chat_name(path)}: {entry['messages']:,} messages, {len(entry['authors'])} authors")
+    elif args.command == 'alias':
+        corpus.alias(args.name, args.same_as)
+        print(f"{args.name} -> {corpus.global_name(args.name)}")
+    else:
+        chats = args.chats.split(',') if args.chats else None
+        try:
+            totals = corpus.totals(chats)
+        except KeyError as e:
+            cli.error(e.args[0])
+        print(corpus.chats().to_string(index=False), end='\n\n')
+        print(totals.authors().head(20).to_string(index=False), end='\n\n')
+        print(totals.daily_counts().to_string(index=False), end='\n\n')
+        print(corpus.response_times(chats).head(20).to_string(index=False))
@@ -0,0 +1,146 @@
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+from collections import Counter
+from functools import lru_cache
+
+def _trie_regex(words):
+    """
+    Builds a regex matching any of `words` from a character trie, so the
+    engine follows one branch per character instead of trying thousands of
+    alternatives. Longer matches win: a ZWJ family or a skin-toned hand is
+    matched whole rather than as its component code points.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        end = node.get('') is True
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if end else body
+
+    return build(trie)
+
+def _coarse_class(chars, gap=256):
+    """
+    A character class covering `chars` with a handful of ranges (code
+    points less than `gap` apart are merged). Few ranges keep the scan as
+    fast as a plain range check; the trie regex weeds out the extras.
+    """
+    ranges = []
+    for code in sorted(ord(c) for c in chars):
+        if ranges and code - ranges[-1][1] <= gap:
+            ranges[-1][1] = code
+        else:
+            ranges.append([code, code])
+    return '[' + ''.join(re.escape(chr(a)) if a == b else f'{re.escape(chr(a))}-{re.escape(chr(b))}'
+                         for a, b in ranges) + ']'
+
+@lru_cache(maxsize=1)
+def emoji_regexes():
+    """
+    Returns (run_regex, emoji_regex), built once per process. run_regex
+    finds stretches of characters that can be part of an emoji; emoji_regex
+    splits such a stretch into whole emojis.
+    """
+    import emoji
+    non_ascii = {c for e in emoji.EMOJI_DATA for c in e if not c.isascii()}
+    return re.compile(_coarse_class(non_ascii) + '+'), re.compile(_trie_regex(emoji.EMOJI_DATA))
+
+# Keycap emojis (e.g. 1️⃣) start with an ASCII character followed by these
+_KEYCAP_BASES = '#*0123456789'
+_KEYCAP_MARKS = '\ufe0f\u20e3'
+
+def _iter_runs(text):
+    """Yields (start, run) for every stretch of emoji characters in `text`."""
+    run_regex = emoji_regexes()[0]
+    for m in run_regex.finditer(text):
+        start, run = m.start(), m.group()
+        if run[0] in _KEYCAP_MARKS and start and text[start - 1] in _KEYCAP_BASES:
+            start -= 1
+            run = text[start] + run
+        yield start, run
+
+def extract_emojis(text):
+    """Returns the emojis in `text`, keeping multi-codepoint emojis whole."""
+    # Every emoji has a non-ASCII code point, so plain ASCII needs no regex at all
+    if text.isascii():
+        return []
+    findall = emoji_regexes()[1].findall
+    return [e for _, run in _iter_runs(text) for e in findall(run)]
+
+def count_emojis(df):
+    """
+    Counts emojis per (Author, Month, Emoji) in a single pass over the
+    messages. Month is 'YYYY-MM' (None for undated messages). Rows are in
+    order of first appearance.
+    """
+    messages = df['Message'].to_numpy()
+    # Pre-filter: only messages with a non-ASCII character can hold emojis
+    rows = np.flatnonzero([not msg.isascii() for msg in messages])
+
+    # Scan all candidate messages as one string, then map hits back to rows
+    selected = [messages[i] for i in rows]
+    text = '\n'.join(selected)
+    lengths = np.fromiter((len(msg) + 1 for msg in selected), dtype=np.int64, count=len(selected))
+    starts = np.cumsum(lengths) - lengths
+
+    positions, runs = [], []
+    for start, run in _iter_runs(text):
+        positions.append(start)
+        runs.append(run)
+    hit_rows = rows[np.searchsorted(starts, positions, side='right') - 1] if runs else []
+
+    dt = df['DateTime']
+    month_codes = (dt.dt.year * 100 + dt.dt.month).fillna(-1).astype('int64').to_numpy()
+    authors = df['Author'].to_numpy()
+    run_counts = Counter(zip(authors[hit_rows], month_codes[hit_rows], runs))
+
+    # Runs repeat a lot ("😂😂", "👍"), so split each distinct one only once
+    findall = emoji_regexes()[1].findall
+    split = {}
+    counts = Counter()
+    for (author, month, run), n in run_counts.items():
+        if run not in split:
+            split[run] = findall(run)
+        for e in split[run]:
+            counts[author, month, e] += n
+
+    out = [(a, f"{m // 100}-{m % 100:02d}" if m >= 0 else None, e, n) for (a, m, e), n in counts.items()]
+    return pd.DataFrame(out, columns=['Author', 'Month', 'Emoji', 'Count'])
+
+def top_emojis(counts, top=10):
+    """The `top` most used emojis from count_emojis() output."""
+    totals = counts.groupby('Emoji', sort=False)['Count'].sum()
+    totals = totals.sort_values(ascending=False, kind='stable').head(top)
+    return totals.reset_index()
+
+if __name__ == "__main__":
+    # Usage: python emojis.py <chat.txt>
+    # Compares the engine with the old per-character EMOJI_DATA comprehension.
+    import emoji
+    from parser import WhatsAppParser
+
+    df = WhatsAppParser(sys.argv[1] if len(sys.argv) > 1 else '../data/_chat.txt').parse()
+
+    t0 = time.perf_counter()
+    legacy = Counter(c for msg in df['Message'] for c in msg if c in emoji.EMOJI_DATA)
+    legacy_time = time.perf_counter() - t0
+
+    emoji_regexes()
+    t0 = time.perf_counter()
+    counts = count_emojis(df)
+    engine_time = time.perf_counter() - t0
+
+    print(f"messages: {len(df):,}")
+    print(f"comprehension: {legacy_time:.3f}s ({sum(legacy.values()):,} emojis)")
+    print(f"engine:        {engine_time:.3f}s ({counts['Count'].sum():,} emojis)")
@@ -1,85 +1,581 @@
-
+import io
+import mmap
+import os
 import re
+import sys
+import time
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from pandas.api.types import union_categoricals
+from classify import classify
+from profiling import profile
+from search import SearchIndex
+from store import (append_chat, file_fingerprint, load_chat, message_count, prefix_hash, read_meta,
+                   save_chat, store_path, update_meta)
+from totals import ChatTotals
+from words import WordIndex
+
+# Number of messages per DataFrame batch yielded by parse_chunks
+DEFAULT_CHUNKSIZE = 100_000
+
+# Number of leading lines inspected to detect the export dialect
+SAMPLE_LINES = 500
+
+# Loose probes used only for dialect detection
+# Bracketed: [dd/mm/yy, HH:MM:SS] Author: Message (iOS/standard export)
+# Dash:      dd/mm/yyyy, HH:MM - Author: Message (Android/other export)
+_TIMESTAMP_PROBE = r'(\d{1,2})/(\d{1,2})/(\d{2,4}), (\d{1,2}):(\d{2})(:\d{2})?(\s?)([AaPp][Mm])?'
+PROBES = {
+    'bracketed': re.compile(r'^\[' + _TIMESTAMP_PROBE + r'\] .*?: '),
+    'dash': re.compile(r'^' + _TIMESTAMP_PROBE + r' - .*?: '),
+}
+
+class Dialect:
+    """
+    A single export layout: bracketed vs dash header, 12h/24h clock,
+    dd/mm vs mm/dd order, 2 or 4 digit years and optional seconds.
+    Holds the one compiled header regex used by the hot parsing loop.
+    """
+    def __init__(self, layout='bracketed', day_first=True, year_digits=2,
+                 seconds=True, twelve_hour=False, ampm_sep=' '):
+        self.layout = layout
+        self.day_first = day_first
+        self.year_digits = year_digits
+        self.seconds = seconds
+        self.twelve_hour = twelve_hour
+        self.ampm_sep = ampm_sep
+
+        ts = r'\d{1,2}/\d{1,2}/\d{%d}, \d{1,2}:\d{2}' % year_digits
+        if seconds:
+            ts += r':\d{2}'
+        if twelve_hour:
+            ts += re.escape(ampm_sep) + r'[AaPp][Mm]'
+
+        if layout == 'bracketed':
+            self.pattern = re.compile(r'^\[(' + ts + r')\] (.*?): (.*)$')
+            # Header lines can only start with '['; anything else is a continuation
+            self.first_chars = '['
+        else:
+            self.pattern = re.compile(r'^(' + ts + r') - (.*?): (.*)$')
+            self.first_chars = '0123456789'
+
+        fmt = '%d/%m/' if day_first else '%m/%d/'
+        fmt += '%y' if year_digits == 2 else '%Y'
+        fmt += ', %I:%M' if twelve_hour else ', %H:%M'
+        if seconds:
+            fmt += ':%S'
+        if twelve_hour:
+            fmt += ampm_sep + '%p'
+        self.datetime_format = fmt
+
+    def __repr__(self):
+        return f"Dialect({self.layout!r}, format={self.datetime_format!r})"
+
+    def to_dict(self):
+        """Constructor arguments, so Dialect(**d) rebuilds the same dialect."""
+        return {
+            'layout': self.layout, 'day_first': self.day_first,
+            'year_digits': self.year_digits, 'seconds': self.seconds,
+            'twelve_hour': self.twelve_hour, 'ampm_sep': self.ampm_sep,
+        }
+
+def detect_dialect(lines):
+    """
+    Detects the export dialect from a sample of raw lines. Falls back to
+    the bracketed dd/mm/yy, HH:MM:SS layout if no header is recognised.
+    """
+    hits = {name: [] for name in PROBES}
+    for line in lines:
+        line = line.strip()
+        for name, probe in PROBES.items():
+            match = probe.match(line)
+            if match:
+                hits[name].append(match.groups())
+                break
+
+    layout = max(hits, key=lambda name: len(hits[name]))
+    groups = hits[layout]
+    if not groups:
+        return Dialect()
+
+    first = max(int(g[0]) for g in groups)
+    second = max(int(g[1]) for g in groups)
+    # dd/mm unless only the second field ever exceeds 12
+    day_first = not (second > 12 and first <= 12)
+
+    year_digits = 4 if len(groups[0][2]) == 4 else 2
+    seconds = groups[0][5] is not None
+    twelve_hour = groups[0][7] is not None
+    ampm_sep = groups[0][6] if twelve_hour else ' '
+
+    return Dialect(layout, day_first, year_digits, seconds, twelve_hour, ampm_sep)
+
+def settle_day_order(dialect, data):
+    """
+    Returns `dialect` with its dd/mm vs mm/dd order decided from every
+    header of the export `data` (str, bytes or mmap) rather than the
+    detection sample, which may not reach a day past the 12th. Each search
+    stops at the first header that decides it.
+    """
+    start = r'^\[' if dialect.layout == 'bracketed' else r'^'
+    over_12 = r'(?:1[3-9]|[23]\d)'
+    year = r'\d{%d}, \d{1,2}:\d{2}' % dialect.year_digits
+    first = start + over_12 + r'/\d{1,2}/' + year
+    second = start + r'\d{1,2}/' + over_12 + '/' + year
+    if not isinstance(data, str):
+        first, second = first.encode(), second.encode()
+
+    if re.search(first, data, re.M):
+        day_first = True
+    elif re.search(second, data, re.M):
+        day_first = False
+    else:
+        return dialect
+    if day_first == dialect.day_first:
+        return dialect
+    return Dialect(**dict(dialect.to_dict(), day_first=day_first))
+
+def iter_records(lines, dialect):
+    """
+    Yields (DateTime, Author, Message) tuples from an iterable of raw lines.
+    Continuations are only flushed once the next header (or the end of the
+    input) is seen, so a multi-line message is always emitted whole.
+    """
+    match_line = dialect.pattern.match
+    first_chars = dialect.first_chars
+    message_buffer = []
+    date_str, author = None, None
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        # Cheap prefix check rejects most continuation lines before the regex
+        match = line[0] in first_chars and match_line(line)
+
+        if match:
+            # If there's a previous message in the buffer, emit it
+            if author:
+                yield (date_str, author, ' '.join(message_buffer))
+
+            # Start new message
+            message_buffer = []
+            date_str = match.group(1)
+            author = match.group(2)
+            message = match.group(3)
+            message_buffer.append(message)
+        else:
+            # If no match, it's a continuation of the previous message
+            if author:
+                message_buffer.append(line)
+
+    # Emit the last message
+    if author:
+        yield (date_str, author, ' '.join(message_buffer))
+
+# Whole seconds since the epoch that datetime64[ns] can hold (int64 minimum is NaT)
+_MIN_SECONDS = np.iinfo(np.int64).min // 1_000_000_000 + 1
+_MAX_SECONDS = np.iinfo(np.int64).max // 1_000_000_000
+
+def _char_matrix(values):
+    """Packs equal-length-padded strings into an (n, width) uint8 matrix."""
+    try:
+        chars = np.array(values, dtype='S')
+    except UnicodeEncodeError:
+        # Non-ASCII separators (e.g. U+202F before AM/PM): clamp code points
+        # to one byte, they are never digits or AM/PM letters anyway
+        chars = np.array(values, dtype=str).view(np.uint32)
+        chars = np.minimum(chars, 255).astype(np.uint8)
+    return chars.view(np.uint8).reshape(len(values), -1)
+
+def _digit_fields(chars, n_fields):
+    """
+    Returns (fields, counts): the integer value of each of the first
+    `n_fields` digit runs per row, and the number of runs per row. Rows
+    sharing a digit layout (zero-padded exports have exactly one) are
+    decoded together by slicing fixed columns.
+    """
+    n, width = chars.shape
+    digits = chars - 48
+    is_digit = digits < 10
+
+    if (is_digit == is_digit[0]).all():
+        layouts = [(0, slice(None))]
+    else:
+        # One integer key per row describing where its digits are; peel off
+        # the (few) distinct layouts one at a time
+        packed = np.packbits(is_digit, axis=1).astype(np.int64)
+        key = packed @ (np.int64(256) ** np.arange(packed.shape[1], dtype=np.int64))
+        layouts = []
+        pending = np.ones(n, dtype=bool)
+        while pending.any():
+            i = np.argmax(pending)
+            rows = key == key[i]
+            layouts.append((i, rows))
+            pending &= ~rows
+
+    fields = np.zeros((n_fields, n), dtype=np.int32)
+    counts = np.zeros(n, dtype=np.int64)
+    for i, rows in layouts:
+        cols = np.flatnonzero(is_digit[i])
+        runs = np.split(cols, np.flatnonzero(np.diff(cols) > 1) + 1) if len(cols) else []
+        counts[rows] = len(runs)
+        sub = digits[rows]
+        for f, run in enumerate(runs[:n_fields]):
+            value = sub[:, run[0]].astype(np.int32)
+            for c in run[1:]:
+                value = value * 10 + sub[:, c]
+            fields[f, rows] = value
+    return fields, counts
+
+def decode_timestamps(values, dialect):
+    """
+    Decodes timestamp strings of a known dialect straight into a
+    datetime64[ns] array. The digit groups are sliced out of a byte matrix
+    with NumPy, so no per-row Python or strptime work is done. Invalid
+    dates (e.g. 31/02) become NaT, matching errors='coerce'.
+    """
+    n = len(values)
+    if n == 0:
+        return np.array([], dtype='datetime64[ns]')
+
+    chars = _char_matrix(values)
+    n_fields = 6 if dialect.seconds else 5
+    fields, counts = _digit_fields(chars, n_fields)
+    valid = counts == n_fields
+
+    first, second, year, hour, minute = fields[:5]
+    sec = fields[5] if dialect.seconds else 0
+    day, month = (first, second) if dialect.day_first else (second, first)
+
+    if dialect.year_digits == 2:
+        # Same pivot as strptime's %y: 69-99 -> 1900s, 00-68 -> 2000s
+        year = np.where(year >= 69, 1900 + year, 2000 + year)
+
+    if dialect.twelve_hour:
+        pm = ((chars == ord('P')) | (chars == ord('p'))).any(axis=1)
+        valid &= (hour >= 1) & (hour <= 12)
+        hour = hour % 12 + np.where(pm, 12, 0)
+
+    valid &= (month >= 1) & (month <= 12)
+    month_idx = (year - 1970) * 12 + np.clip(month, 1, 12) - 1
+    month_start = month_idx.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+    month_len = (month_idx + 1).astype('datetime64[M]').astype('datetime64[D]').astype(np.int64) - month_start
+    valid &= (day >= 1) & (day <= month_len)
+    # strptime accepts a leap second (:60) and rolls it into the next minute
+    valid &= (hour < 24) & (minute < 60) & (sec <= 60)
+
+    seconds = (month_start + day - 1) * 86400 + hour * 3600 + minute * 60 + sec
+    # datetime64[ns] only spans 1677-09-21 to 2262-04-11; beyond that the
+    # nanoseconds would wrap around instead of overflowing
+    valid &= (seconds >= _MIN_SECONDS) & (seconds <= _MAX_SECONDS)
+    nanos = np.where(valid, seconds * 1_000_000_000, np.iinfo(np.int64).min)
+    return nanos.view('datetime64[ns]')
+
+def records_to_frame(records, dialect):
+    """
+    Builds a DataFrame from (DateTime, Author, Message) records in the
+    compact chat schema: DateTime decoded directly to datetime64[ns],
+    Author categorical (one small int code per row) and Message as
+    Arrow-backed strings.
+    """
+    if not records:
+        dates, authors, messages = [], [], []
+    else:
+        dates, authors, messages = zip(*records)
+
+    return pd.DataFrame({
+        'DateTime': decode_timestamps(dates, dialect),
+        'Author': pd.Categorical(authors),
+        'Message': pd.array(messages, dtype='str'),
+    })
+
+def concat_frames(frames):
+    """Concatenates parsed chunks in order, merging their Author categories."""
+    if len(frames) == 1:
+        return frames[0]
+    # Chunks have different categories, which pd.concat would turn into objects;
+    # sorted, as pd.Categorical sorts them, so the split points do not show
+    authors = union_categoricals([f['Author'] for f in frames], sort_categories=True)
+    df = pd.concat([f.drop(columns='Author') for f in frames], ignore_index=True)
+    df.insert(1, 'Author', authors)
+    return df
+
+def parse_text(text, dialect=None):
+    """Parses the full text of a chat export and returns a DataFrame."""
+    lines = text.split('\n')
+    if dialect is None:
+        dialect = settle_day_order(detect_dialect(lines[:SAMPLE_LINES]), text)
+    return records_to_frame(list(iter_records(lines, dialect)), dialect)
+
+def _new_tail(meta, data):
+    """
+    Returns the part of export `data` that is not in the store yet, or None
+    if the stored messages are not an exact prefix of this export.
+    """
+    if meta is None or len(data) < meta['source_bytes']:
+        return None
+    if prefix_hash(data, meta['source_bytes']) != meta['source_hash']:
+        return None
+
+    tail = data[meta['source_bytes']:].decode('utf-8')
+    # The tail must start a new message; otherwise the last stored message
+    # was extended and the export has to be parsed from scratch
+    dialect = Dialect(**meta['dialect'])
+    first_line = next((line.strip() for line in tail.split('\n') if line.strip()), None)
+    if first_line is not None and not dialect.pattern.match(first_line):
+        return None
+    # A stored chat whose days never passed the 12th was parsed with a
+    # guessed order; new messages proving it wrong need a full parse
+    if settle_day_order(dialect, tail) is not dialect:
+        return None
+    return tail
+
+def ingest(data, path, fingerprint, parse=None):
+    """
+    Brings the columnar store at `path` up to date with the export bytes
+    `data` and returns (df, totals). When the store was built from an
+    earlier export that this one extends (weekly re-exports of the same
+    chat), only the new tail is parsed and appended. Every message is
+    classified once here (the Flags column), and the ChatTotals, WordIndex
+    and search postings of every parsed slice are stored with it, so the
+    totals of the whole chat are the sum of the stored ones (see
+    ChatTotals.load).
+    `parse` optionally replaces the full parse with a callable returning
+    (df, dialect).
+    """
+    meta = read_meta(path)
+    if meta is not None and meta['fingerprint'] == fingerprint:
+        return _load_stored(path)
+
+    tail = _new_tail(meta, data)
+    if tail is not None and not tail.strip():
+        # Same messages under a new fingerprint (e.g. the file was touched or
+        # copied): only the metadata changes, no empty part is appended
+        update_meta(path, dict(
+            meta,
+            fingerprint=fingerprint,
+            source_bytes=len(data),
+            source_hash=prefix_hash(data, len(data)),
+        ))
+        return _load_stored(path)
+    if tail is None:
+        with profile('parse') as stage:
+            if parse is None:
+                text = data[:].decode('utf-8')
+                dialect = detect_dialect(text.split('\n', SAMPLE_LINES)[:SAMPLE_LINES])
+                dialect = settle_day_order(dialect, text)
+                df = parse_text(text, dialect)
+            else:
+                df, dialect = parse()
+            stage.rows = len(df)
+        with profile('classify', len(df)):
+            df['Flags'] = classify(df['Message'])
+        with profile('index', len(df)):
+            totals = ChatTotals.from_frame(df)
+            words = WordIndex.from_frame(df)
+            postings = SearchIndex.postings_frame(df['Message'])
+        with profile('save', len(df)):
+            save_chat(df, path, {
+                'fingerprint': fingerprint,
+                'source_bytes': len(data),
+                'source_hash': prefix_hash(data, len(data)),
+                'dialect': dialect.to_dict(),
+            }, indexes={'totals': totals.to_counts(), 'words': words.counts, 'search': postings})
+        return df, totals
+
+    with profile('parse new messages') as stage:
+        new = parse_text(tail, Dialect(**meta['dialect']))
+        stage.rows = len(new)
+    with profile('classify', len(new)):
+        new['Flags'] = classify(new['Message'])
+    with profile('append', len(new)):
+        indexes = {
+            'totals': ChatTotals.from_frame(new).to_counts(),
+            'words': WordIndex.from_frame(new).counts,
+            # Posting lists refer to rows of the whole stored chat
+            'search': SearchIndex.postings_frame(new['Message'], first_row=message_count(path)),
+        }
+        append_chat(new, path, dict(
+            meta,
+            fingerprint=fingerprint,
+            source_bytes=len(data),
+            source_hash=prefix_hash(data, len(data)),
+        ), indexes=indexes)
+    return _load_stored(path)
+
+def _load_stored(path):
+    """Reads the chat and its totals back from the store."""
+    with profile('load store') as stage:
+        df = load_chat(path)
+        stage.rows = len(df)
+        return df, ChatTotals.load(path)
+
+def split_offsets(file_path, n_parts, dialect):
+    """
+    Returns byte offsets [0, ..., size] that cut the file into roughly
+    `n_parts` ranges. Every inner offset sits at the start of a message
+    header line, so no message is split between two ranges.
+    """
+    size = os.path.getsize(file_path)
+    offsets = [0]
+
+    with open(file_path, 'rb') as f:
+        for i in range(1, n_parts):
+            target = max(size * i // n_parts, offsets[-1])
+            f.seek(target)
+            if target:
+                # Skip the (possibly partial) line we landed in
+                f.readline()
+
+            while True:
+                pos = f.tell()
+                raw = f.readline()
+                if not raw:
+                    pos = size
+                    break
+                if dialect.pattern.match(raw.decode('utf-8', errors='ignore').strip()):
+                    break
+
+            if pos >= size:
+                break
+            if pos > offsets[-1]:
+                offsets.append(pos)
+
+    offsets.append(size)
+    return offsets
+
+def _parse_range(file_path, start, end, dialect):
+    """Worker: parses the byte range [start, end) of the file into a DataFrame."""
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        raw = f.read(end - start)
+    # Decode through TextIOWrapper so newline handling matches the serial path
+    lines = io.TextIOWrapper(io.BytesIO(raw), encoding='utf-8')
+    return records_to_frame(list(iter_records(lines, dialect)), dialect)
 
 class WhatsAppParser:
-    def __init__(self, file_path):
+    def __init__(self, file_path, dialect=None):
         self.file_path = file_path
-        self.data = []
+        self.dialect = dialect
 
-    def parse(self):
+    def detect(self):
         """
-        Parses the WhatsApp chat file and returns a pandas DataFrame.
+        Detects (once) and returns the export dialect from the first lines of
+        the file, with the day order settled on all of them.
         """
-        # Regex patterns to try
-        # Pattern 1: [dd/mm/yy, HH:MM:SS] Author: Message (iOS/standard export)
-        # Pattern 2: dd/mm/yyyy, HH:MM - Author: Message (Android/other export)
-        patterns = [
-            r'^\[(\d{2}/\d{2}/\d{2}, \d{2}:\d{2}:\d{2})\] (.*?): (.*)$',
-            r'^(\d{2}/\d{2}/\d{4}, \d{2}:\d{2}) - (.*?): (.*)$'
-        ]
-        
+        if self.dialect is None:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                sample = [line for _, line in zip(range(SAMPLE_LINES), f)]
+            dialect = detect_dialect(sample)
+            with open(self.file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        dialect = settle_day_order(dialect, data)
+            self.dialect = dialect
+        return self.dialect
+
+    def iter_messages(self):
+        """
+        Lazily yields (DateTime, Author, Message) tuples from the chat file.
+        The file is read line by line, so only the message currently being
+        assembled is held in memory.
+        """
+        dialect = self.detect()
         with open(self.file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            
-        message_buffer = [] 
-        date, time, author = None, None, None
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            match = None
-            for p in patterns:
-                match = re.match(p, line)
-                if match:
-                    break
-            
-            if match:
-                # If there's a previous message in the buffer, save it
-                if author:
-                    self.data.append([date_str, author, ' '.join(message_buffer)])
-                
-                # Start new message
-                message_buffer = []
-                date_str = match.group(1)
-                author = match.group(2)
-                message = match.group(3)
-                message_buffer.append(message)
-            else:
-                # If no match, it's a continuation of the previous message
-                if author:
-                    message_buffer.append(line)
-
-        # Append the last message
-        if author:
-            self.data.append([date_str, author, ' '.join(message_buffer)])
-
-        df = pd.DataFrame(self.data, columns=['DateTime', 'Author', 'Message'])
-        
-        # Convert DateTime to datetime objects
-        # We need to handle multiple formats now
-        df = pd.DataFrame(self.data, columns=['DateTime', 'Author', 'Message'])
-        
-        # Vectorized date parsing - much faster
-        # Try primary format first
-        df['temp_date'] = pd.to_datetime(df['DateTime'], format='%d/%m/%Y, %H:%M', errors='coerce')
-        
-        # Try secondary format for rows that failed
-        mask = df['temp_date'].isna()
-        if mask.any():
-            df.loc[mask, 'temp_date'] = pd.to_datetime(df.loc[mask, 'DateTime'], format='%d/%m/%y, %H:%M:%S', errors='coerce')
-            
-        df['DateTime'] = df['temp_date']
-        df.drop(columns=['temp_date'], inplace=True)
+            yield from iter_records(f, dialect)
+
+    def parse_chunks(self, chunksize=DEFAULT_CHUNKSIZE):
+        """
+        Yields DataFrames of at most `chunksize` messages each, so peak memory
+        is bounded by the batch size rather than the size of the export.
+        """
+        batch = []
+        for record in self.iter_messages():
+            batch.append(record)
+            if len(batch) >= chunksize:
+                yield records_to_frame(batch, self.dialect)
+                batch = []
+
+        if batch:
+            yield records_to_frame(batch, self.dialect)
 
+    def parse(self, workers=1):
+        """
+        Parses the WhatsApp chat file and returns a pandas DataFrame.
+        With `workers` > 1 (or None for all cores) the file is split at
+        message boundaries and the ranges are parsed in a process pool.
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        with profile('WhatsAppParser.parse') as stage:
+            if workers > 1:
+                df = self.parse_parallel(workers)
+            else:
+                chunks = list(self.parse_chunks())
+                df = concat_frames(chunks) if chunks else records_to_frame([], self.detect())
+            stage.rows = len(df)
         return df
 
+    def load(self, workers=1):
+        """
+        Returns the parsed chat, memory-mapping the columnar store next to the
+        export when it is up to date. A re-export that extends the stored
+        chat only has its new messages parsed; anything else is parsed in
+        full (with `workers` processes) and saved.
+        """
+        path = store_path(self.file_path)
+        fingerprint = file_fingerprint(self.file_path)
+        meta = read_meta(path)
+        if meta is not None and meta['fingerprint'] == fingerprint:
+            return load_chat(path)
+
+        def parse():
+            df = self.parse(workers=workers)
+            return df, self.dialect
+
+        with open(self.file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return ingest(b'', path, fingerprint, parse)[0]
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return ingest(data, path, fingerprint, parse)[0]
+
+    def parse_parallel(self, workers):
+        """
+        Parses the file in `workers` processes and merges the partial
+        DataFrames in file order. The result is identical to parse().
+        """
+        dialect = self.detect()
+        offsets = split_offsets(self.file_path, workers, dialect)
+        ranges = list(zip(offsets[:-1], offsets[1:]))
+        if len(ranges) <= 1:
+            return self.parse()
+
+        with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+            chunks = list(pool.map(_parse_range, [self.file_path] * len(ranges),
+                                   [r[0] for r in ranges], [r[1] for r in ranges],
+                                   [dialect] * len(ranges)))
+
+        return concat_frames(chunks)
+
 if __name__ == "__main__":
-    # Test with dummy data
-    parser = WhatsAppParser('../data/_chat.txt')
-    df = parser.parse()
-    print(df.head())
+    # Usage: python parser.py [chat.txt] [max_workers]
+    # With max_workers, prints the parse time for 1..max_workers processes.
+    file_path = sys.argv[1] if len(sys.argv) > 1 else '../data/_chat.txt'
+    parser = WhatsAppParser(file_path)
+
+    if len(sys.argv) > 2:
+        baseline = None
+        for n in range(1, int(sys.argv[2]) + 1):
+            t0 = time.perf_counter()
+            df = parser.parse(workers=n)
+            elapsed = time.perf_counter() - t0
+            baseline = baseline or elapsed
+            print(f"workers={n}: {elapsed:.2f}s (speedup {baseline / elapsed:.2f}x)")
+    else:
+        df = parser.parse()
+        print(df.head())
     print(f"Total messages: {len(df)}")
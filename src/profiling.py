@@ -0,0 +1,123 @@
+import contextvars
+import gc
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger('whatsapp.profiling')
+
+# The Profiler that profile() records into; each Streamlit session reruns
+# its script in its own thread, so every session sees only its own
+_active = contextvars.ContextVar('profiler', default=None)
+
+def rss():
+    """Resident set size of this process in bytes (0 where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+class PeakMemory:
+    """
+    Samples the resident set size in a background thread to find the peak
+    reached inside a `with` block; `delta` is how far it rose above the
+    start. RSS is per process, so concurrent work is counted as well.
+    """
+    def __init__(self, interval=0.005, collect=False):
+        self.interval = interval
+        self.collect = collect
+
+    def __enter__(self):
+        if self.collect:
+            gc.collect()
+        self.start = self.peak = rss()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self.peak = max(self.peak, rss())
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss())
+        self.delta = self.peak - self.start
+
+class Stage:
+    """One timed block: its wall time, rows handled and peak memory growth."""
+    def __init__(self, name, depth, rows=None):
+        self.name = name
+        self.depth = depth
+        self.rows = rows
+        self.cached = False
+        self.seconds = 0.0
+        self.peak_bytes = 0
+
+    def to_dict(self):
+        return {'stage': self.name, 'depth': self.depth, 'seconds': round(self.seconds, 4),
+                'rows': self.rows, 'peak_bytes': self.peak_bytes, 'cached': self.cached}
+
+class Profiler:
+    """Collects the stages timed by profile() during one run (one Streamlit rerun)."""
+    def __init__(self):
+        self.stages = []
+        self.depth = 0
+        self.started = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def finish(self):
+        """Logs the total wall time of the run."""
+        logger.info(json.dumps({'stage': 'total', 'depth': 0, 'seconds': round(self.elapsed(), 4),
+                                'stages': len(self.stages)}))
+
+    def report(self):
+        """One row per stage in the order they started, nested ones indented."""
+        return [{'Stage': '  ' * s.depth + s.name, 'Seconds': s.seconds, 'Rows': s.rows,
+                 'Peak MiB': s.peak_bytes / 2**20, 'Cached': s.cached} for s in self.stages]
+
+def start():
+    """Starts a new Profiler for this thread's run and returns it."""
+    profiler = Profiler()
+    _active.set(profiler)
+    return profiler
+
+@contextmanager
+def profile(name, rows=None):
+    """
+    Times the block as stage `name`, tracking its peak memory, and yields
+    the Stage so the block can set `rows` or `cached`. The stage is logged
+    as one JSON object and recorded in the active Profiler, if any.
+    """
+    profiler = _active.get()
+    stage = Stage(name, profiler.depth if profiler else 0, rows)
+    if profiler:
+        profiler.stages.append(stage)
+        profiler.depth += 1
+    try:
+        with PeakMemory() as mem:
+            t0 = time.perf_counter()
+            yield stage
+    finally:
+        stage.seconds = time.perf_counter() - t0
+        stage.peak_bytes = mem.delta
+        if profiler:
+            profiler.depth -= 1
+        logger.info(json.dumps(stage.to_dict()))
+
+def enable_logging(level=logging.INFO, stream=sys.stderr):
+    """Writes the stage records, one JSON object per line, to `stream`."""
+    if not logger.handlers:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(level)
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+# Whatever the size of the chat, a chart or table sends at most this much
+# to the browser: bars per bar chart (the rest go in one "Others" bar),
+# points per line or area chart and rows per table page
+MAX_BARS = 25
+MAX_POINTS = 500
+TABLE_PAGE_SIZE = 50
+# Time series are counted in the finest bins (day, week, month) giving at
+# most this many, then downsampled to MAX_POINTS
+MAX_BINS = 2000
+
+# Bin widths in days, finest first
+FREQUENCIES = {'D': 1, 'W': 7, 'M': 30.44}
+FREQUENCY_NAMES = {'D': 'day', 'W': 'week', 'M': 'month'}
+
+def top_n(df, label, by, n=MAX_BARS, others='Others'):
+    """
+    The `n` rows of `df` with the largest `by` (a column name or array),
+    in their original order, plus one `others` row summing the numeric
+    columns of the rest (no extra row if `others` is None). `label` is the
+    column naming the rows.
+    """
+    if len(df) <= n:
+        return df
+    values = df[by].to_numpy() if isinstance(by, str) else np.asarray(by)
+    keep = np.zeros(len(df), dtype=bool)
+    keep[np.argsort(-values, kind='stable')[:n - (others is not None)]] = True
+    top = df[keep]
+    if others is None:
+        return top
+    rest = df[~keep]
+    bucket = {col: rest[col].sum() if pd.api.types.is_numeric_dtype(df[col]) else None for col in df.columns}
+    bucket[label] = f"{others} ({len(rest):,})"
+    return pd.concat([top, pd.DataFrame([bucket])], ignore_index=True)
+
+def time_frequency(first, last, max_bins=MAX_BINS):
+    """
+    'D', 'W' or 'M': the finest bins that cover the days `first` to `last`
+    (inclusive, datetime64[D]) in at most `max_bins` bins.
+    """
+    span = int((last - first) / np.timedelta64(1, 'D')) + 1
+    for freq, days in FREQUENCIES.items():
+        if span / days <= max_bins:
+            return freq
+    return 'M'
+
+def lttb(x, y, n_out):
+    """
+    Positions of `n_out` of the points (x, y) chosen by Largest-Triangle-
+    Three-Buckets: the first and last point, and from each of n_out - 2
+    equal buckets in between the point forming the largest triangle with
+    the one kept before it and the average of the next bucket. Peaks and
+    dips survive, unlike with every k-th point. `x` must be sorted.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Average of every bucket, and of the last point as the final "next bucket"
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    sizes = np.diff(edges)
+    mean_x = np.append(sums_x / sizes, x[-1])
+    mean_y = np.append(sums_y / sizes, y[-1])
+
+    picked = np.empty(n_out, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[picked[i]], y[picked[i]]
+        area = np.abs((ax - mean_x[i + 1]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (mean_y[i + 1] - ay))
+        picked[i + 1] = lo + int(np.argmax(area))
+    return picked
+
+def downsample(df, x, y, max_points=MAX_POINTS):
+    """At most `max_points` rows of `df` (sorted by `x`), picked by lttb() on columns `x` and `y`."""
+    if len(df) <= max_points:
+        return df
+    xs = df[x].to_numpy()
+    if np.issubdtype(xs.dtype, np.datetime64):
+        xs = xs.astype('datetime64[ns]').astype(np.int64)
+    elif not np.issubdtype(xs.dtype, np.number):
+        # Labels (e.g. 'YYYY-MM'), evenly spaced in their sorted order
+        xs = np.arange(len(xs))
+    return df.iloc[lttb(xs, df[y].to_numpy(), max_points)].reset_index(drop=True)
+
+def page(df, number, size=TABLE_PAGE_SIZE):
+    """Rows of page `number` (from 1) of `df`."""
+    return df.iloc[(number - 1) * size:number * size]
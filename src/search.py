@@ -0,0 +1,235 @@
+import re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from store import load_index_table
+
+# Runs of anything but letters, digits and combining marks separate tokens
+SEPARATOR_PATTERN = r'[^\pL\pN\pM]+'
+# Quoted phrases and bare words of a query
+_QUERY_PARTS = re.compile(r'"([^"]*)"|(\S+)')
+
+# ASCII bytes that are part of a token (lowercase letters and digits)
+_ASCII_WORD = np.zeros(256, dtype=bool)
+_ASCII_WORD[np.frombuffer(b'abcdefghijklmnopqrstuvwxyz0123456789', dtype=np.uint8)] = True
+
+def _string_array(values):
+    """`values` as one lowercase Arrow large_string array, nulls as empty strings."""
+    if not isinstance(values, (pa.Array, pa.ChunkedArray)):
+        values = pa.array(pd.Series(values, dtype='str').fillna(''), type=pa.large_string())
+    if isinstance(values, pa.ChunkedArray):
+        values = values.combine_chunks()
+    return pc.utf8_lower(values.cast(pa.large_string()).fill_null(''))
+
+def _ascii_tokens(lower, rows):
+    """
+    Tokenizes the ASCII strings `lower` (row numbers `rows`) on their bytes
+    with NumPy; the Arrow regex split is an order of magnitude slower.
+    """
+    offsets = np.frombuffer(lower.buffers()[1], dtype=np.int64)[lower.offset:lower.offset + len(lower) + 1]
+    data = np.frombuffer(lower.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]]
+    offsets = offsets - offsets[0]
+
+    word = _ASCII_WORD[data]
+    # Tokens never run across the start of the next string
+    cut = np.zeros(len(word) + 1, dtype=bool)
+    cut[offsets] = True
+    previous = np.concatenate([[False], word[:-1]])
+    following = np.concatenate([word[1:], [False]])
+    starts = np.flatnonzero(word & (cut[:-1] | ~previous))
+    ends = np.flatnonzero(word & (cut[1:] | ~following)) + 1
+
+    # Token i spans [starts[i], ends[i]); the strings in between are dropped
+    bounds = np.empty(2 * len(starts), dtype=np.int64)
+    bounds[0::2], bounds[1::2] = starts, ends
+    if not len(bounds):
+        return pa.array([], type=pa.large_string()), rows[:0]
+    pieces = pa.LargeStringArray.from_buffers(len(bounds) - 1, pa.py_buffer(bounds), pa.py_buffer(data))
+    tokens = pieces.take(pa.array(np.arange(0, len(pieces), 2)))
+    token_rows = rows[np.searchsorted(offsets, starts, side='right') - 1]
+    return tokens, token_rows
+
+def tokenize(values):
+    """
+    Splits every string of `values` into lowercase tokens and returns
+    (tokens, rows): an Arrow string array and the position of the string
+    each token came from. The tokens of each string are in order.
+    """
+    lower = _string_array(values)
+    ascii_rows = np.flatnonzero(pc.string_is_ascii(lower).to_numpy(zero_copy_only=False))
+    other_rows = np.setdiff1d(np.arange(len(lower)), ascii_rows, assume_unique=True)
+
+    tokens, rows = _ascii_tokens(lower.take(pa.array(ascii_rows)), ascii_rows)
+    if other_rows.size:
+        parts = pc.split_pattern_regex(lower.take(pa.array(other_rows)), SEPARATOR_PATTERN)
+        other = pc.list_flatten(parts)
+        parents = other_rows[pc.list_parent_indices(parts).to_numpy()]
+        nonempty = pc.greater(pc.binary_length(other), 0)
+        other, parents = other.filter(nonempty), parents[nonempty.to_numpy(zero_copy_only=False)]
+        tokens = pa.concat_arrays([tokens, other.cast(pa.large_string())])
+        rows = np.concatenate([rows, parents])
+    return tokens, rows
+
+def parse_query(query):
+    """Splits a query into the word tokens and phrases (lists of tokens) it requires."""
+    words, phrases = [], []
+    for phrase, word in _QUERY_PARTS.findall(query):
+        tokens = tokenize([phrase or word])[0].to_pylist()
+        if phrase and len(tokens) > 1:
+            phrases.append(tokens)
+        words.extend(tokens)
+    return words, phrases
+
+class SearchIndex:
+    """
+    Inverted index over the messages of a chat: for every token, the
+    sorted row numbers (posting list) of the messages containing it. A
+    query intersects the posting lists of its words, so its cost depends
+    on how often they occur rather than on the size of the chat. It is
+    built once per ingested part and stored with the chat, like the
+    totals and word index.
+    """
+    def __init__(self, vocabulary=None, offsets=None, postings=None, n_rows=0):
+        # Token -> position; its postings are postings[offsets[i]:offsets[i + 1]]
+        self.vocabulary = vocabulary or {}
+        self.offsets = np.zeros(1, dtype=np.int64) if offsets is None else offsets
+        self.postings = np.zeros(0, dtype=np.int64) if postings is None else postings
+        self.n_rows = n_rows
+
+    @staticmethod
+    def postings_frame(messages, first_row=0):
+        """
+        The (Token, Row) pairs of `messages` sorted by token and row, rows
+        numbered from `first_row`; what is stored for each part of a chat.
+        """
+        tokens, rows = tokenize(messages)
+        encoded = tokens.dictionary_encode()
+        dictionary = encoded.dictionary.to_numpy(zero_copy_only=False)
+        # Renumber the codes in token order so that sorting by code sorts by token
+        rank = np.empty(len(dictionary), dtype=np.int64)
+        rank[np.argsort(dictionary, kind='stable')] = np.arange(len(dictionary))
+        keys = rank[encoded.indices.to_numpy()] * (len(messages) + 1) + rows
+        keys = np.sort(keys)
+        keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])] if len(keys) else keys
+        codes, rows = np.divmod(keys, len(messages) + 1)
+        return pd.DataFrame({
+            'Token': np.sort(dictionary)[codes].astype(object),
+            'Row': (rows + first_row).astype(np.int64),
+        })
+
+    @classmethod
+    def from_postings(cls, table, n_rows):
+        """Builds the index from a table of postings_frame() parts, in part order."""
+        if table is None or table.num_rows == 0:
+            return cls(n_rows=n_rows)
+        tokens = table.column('Token').combine_chunks()
+        if not pa.types.is_dictionary(tokens.type):
+            tokens = tokens.dictionary_encode()
+        codes = tokens.indices.to_numpy().astype(np.int64)
+        rows = table.column('Row').to_numpy().astype(np.int64)
+        # Parts hold increasing rows, so a stable sort by token keeps every list sorted
+        if np.any(codes[1:] < codes[:-1]):
+            order = np.argsort(codes, kind='stable')
+            codes, rows = codes[order], rows[order]
+        counts = np.bincount(codes, minlength=len(tokens.dictionary))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        vocabulary = dict(zip(tokens.dictionary.to_pylist(), range(len(tokens.dictionary))))
+        return cls(vocabulary, offsets, rows, n_rows)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Indexes the messages of a parsed chat DataFrame."""
+        postings = cls.postings_frame(df['Message'])
+        return cls.from_postings(pa.Table.from_pandas(postings, preserve_index=False), len(df))
+
+    @classmethod
+    def load(cls, path, n_rows):
+        """The index saved with the chat store at `path` (empty if there is none)."""
+        return cls.from_postings(load_index_table(path, 'search'), n_rows)
+
+    def lookup(self, token):
+        """Sorted rows of the messages containing `token`."""
+        i = self.vocabulary.get(token)
+        if i is None:
+            return self.postings[:0]
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+    def select_rows(self, keep):
+        """
+        Returns the index of the rows where the boolean array `keep` is
+        set, renumbered as they are in df[keep].reset_index(drop=True).
+        """
+        keep = np.asarray(keep, dtype=bool)
+        new_ids = np.cumsum(keep) - 1
+        kept = keep[self.postings]
+        token_of = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        counts = np.bincount(token_of[kept], minlength=len(self.offsets) - 1)
+        return SearchIndex(self.vocabulary, np.concatenate([[0], np.cumsum(counts)]),
+                           new_ids[self.postings[kept]], int(keep.sum()))
+
+    def match(self, query, messages):
+        """
+        Sorted rows of the messages matching every word of `query` and
+        every "quoted phrase" (its words next to each other, in order).
+        `messages` is the Message column the index was built from.
+        """
+        words, phrases = parse_query(query)
+        if not words:
+            return self.postings[:0]
+        lists = sorted((self.lookup(w) for w in set(words)), key=len)
+        rows = lists[0]
+        for other in lists[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+            if not rows.size:
+                break
+
+        for phrase in phrases:
+            if not rows.size:
+                break
+            # Only the candidates that contain every word are tokenized again
+            tokens, token_rows = tokenize(messages.iloc[rows])
+            # A phrase starts at token i if the next tokens of the same message follow it
+            n = len(tokens) - len(phrase) + 1
+            if n <= 0:
+                return rows[:0]
+            hit = np.ones(n, dtype=bool)
+            for j, word in enumerate(phrase):
+                hit &= pc.equal(tokens, word).to_numpy(zero_copy_only=False)[j:j + n]
+                hit &= token_rows[j:j + n] == token_rows[:n]
+            rows = rows[np.unique(token_rows[:n][hit])]
+        return rows
+
+def search(df, index, query, authors=None, start=None, end=None):
+    """
+    Rows of `df` matching `query`, newest first, optionally only from
+    `authors` and between the days `start` and `end` (inclusive). A date
+    bound leaves undated messages out.
+    """
+    rows = index.match(query, df['Message'])
+    if authors:
+        rows = rows[df['Author'].iloc[rows].isin(authors).to_numpy()]
+    if start is not None or end is not None:
+        times = df['DateTime'].to_numpy()[rows]
+        mask = ~np.isnat(times)
+        if start is not None:
+            mask &= times >= np.datetime64(pd.Timestamp(start).date(), 'D')
+        if end is not None:
+            mask &= times < np.datetime64(pd.Timestamp(end).date(), 'D') + np.timedelta64(1, 'D')
+        rows = rows[mask]
+    return rows[::-1]
+
+def with_context(df, rows, context=2):
+    """
+    The messages around each of `rows`: `context` before and after, as a
+    DataFrame with the Hit (position in `rows`) each belongs to and
+    whether it is the matching message itself.
+    """
+    offsets = np.arange(-context, context + 1)
+    around = np.asarray(rows)[:, None] + offsets
+    valid = (around >= 0) & (around < len(df))
+    hits = np.repeat(np.arange(len(rows)), len(offsets)).reshape(around.shape)
+    out = df.iloc[around[valid]][['DateTime', 'Author', 'Message']].reset_index(drop=True)
+    out.insert(0, 'Hit', hits[valid])
+    out['Match'] = np.broadcast_to(offsets == 0, around.shape)[valid]
+    return out
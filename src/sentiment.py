@@ -0,0 +1,140 @@
+import glob
+import hashlib
+import multiprocessing
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+# Distinct messages scored per task sent to a worker process
+BATCH_SIZE = 5_000
+# Cache parts are merged into one once there are this many
+MAX_CACHE_PARTS = 16
+# Workers start from a fresh process rather than a fork of the caller, which
+# may be a multi-threaded server (forking one can deadlock the child)
+POOL_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+def ensure_lexicon():
+    """Downloads the VADER lexicon if it is not installed yet."""
+    import nltk
+    try:
+        nltk.data.find('sentiment/vader_lexicon.zip')
+    except LookupError:
+        nltk.download('vader_lexicon', quiet=True)
+
+def message_hash(text):
+    """Stable signed 64-bit hash of a message text."""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+# One analyzer per (worker) process, created on first use. NLTK takes over
+# a second to import, so it is only loaded once something needs scoring.
+_analyzer = None
+
+def _score_batch(texts):
+    global _analyzer
+    if _analyzer is None:
+        from nltk.sentiment.vader import SentimentIntensityAnalyzer
+        _analyzer = SentimentIntensityAnalyzer()
+    # VADER works best on raw text (with emojis/caps), so we use the original message
+    return [_analyzer.polarity_scores(text)['compound'] for text in texts]
+
+class ScoreCache:
+    """
+    On-disk map of message hash -> compound score, stored as Parquet parts
+    in `cache_dir` and shared by every chat, so a message text is only ever
+    scored once.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self._scores = None
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.cache_dir, 'part-*.parquet')))
+
+    def _load(self):
+        if self._scores is None:
+            tables = [pq.read_table(p) for p in self._parts()]
+            if tables:
+                table = pa.concat_tables(tables)
+                self._scores = pd.Series(table.column('Score').to_numpy(),
+                                         index=table.column('Hash').to_numpy())
+                self._scores = self._scores[~self._scores.index.duplicated()]
+            else:
+                self._scores = pd.Series(dtype='float64', index=pd.Index([], dtype='int64'))
+        return self._scores
+
+    def lookup(self, hashes):
+        """Scores for `hashes`, NaN where a hash has not been scored yet."""
+        return self._load().reindex(hashes).to_numpy(dtype='float64', copy=True)
+
+    def add(self, hashes, scores):
+        """Stores newly computed scores as a new part."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        new = pd.Series(scores, index=hashes)
+        self._scores = pd.concat([self._load(), new])
+
+        parts = self._parts()
+        if len(parts) >= MAX_CACHE_PARTS:
+            # Compact everything into a single part
+            data, stale = self._scores, parts
+        else:
+            data, stale = new, []
+        index = int(os.path.basename(parts[-1])[5:10]) + 1 if parts else 0
+        table = pa.table({'Hash': pa.array(data.index.to_numpy(dtype='int64')),
+                          'Score': pa.array(data.to_numpy(dtype='float64'))})
+        pq.write_table(table, os.path.join(self.cache_dir, f"part-{index:05d}.parquet"))
+        for path in stale:
+            os.remove(path)
+
+def score_messages(messages, workers=1, cache_dir=None):
+    """
+    Returns the VADER compound score of every message, aligned with
+    `messages`. Identical texts are scored once, previously seen texts come
+    from the on-disk cache in `cache_dir`, and the rest are scored in
+    batches across `workers` processes (None for all cores).
+    """
+    codes, uniques = pd.factorize(pd.Series(messages, dtype='str').fillna(''))
+    uniques = list(uniques)
+    scores = np.full(len(uniques), np.nan)
+
+    cache = ScoreCache(cache_dir) if cache_dir else None
+    if cache is not None:
+        hashes = np.fromiter((message_hash(t) for t in uniques), dtype=np.int64, count=len(uniques))
+        scores = cache.lookup(hashes)
+
+    missing = np.flatnonzero(np.isnan(scores))
+    if missing.size:
+        ensure_lexicon()
+        texts = [uniques[i] for i in missing]
+        batches = [texts[i:i + BATCH_SIZE] for i in range(0, len(texts), BATCH_SIZE)]
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers > 1 and len(batches) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(batches)),
+                                     mp_context=multiprocessing.get_context(POOL_START_METHOD)) as pool:
+                results = list(pool.map(_score_batch, batches))
+        else:
+            results = [_score_batch(batch) for batch in batches]
+
+        new = np.fromiter(chain.from_iterable(results), dtype='float64', count=len(texts))
+        scores[missing] = new
+        if cache is not None:
+            cache.add(hashes[missing], new)
+
+    return scores[codes]
+
+def author_sentiment(df, scores):
+    """Average sentiment per author, most positive first."""
+    user_sentiment = pd.Series(scores, index=df.index).groupby(df['Author']).mean()
+    user_sentiment = user_sentiment.rename('Sentiment').reset_index()
+    return user_sentiment.sort_values('Sentiment', ascending=False)
+
+def monthly_sentiment(df, scores):
+    """Average sentiment per calendar month."""
+    month = df['DateTime'].dt.to_period('M').astype(str).rename('Month')
+    monthly = pd.Series(scores, index=df.index).groupby(month[df['DateTime'].notna()]).mean()
+    return monthly.rename('Sentiment').reset_index()
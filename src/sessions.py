@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+
+# A reply is from a different author within this many minutes
+RESPONSE_WINDOW_MINUTES = 60
+# Seconds between two messages from different authors to count as an interaction
+REPLY_THRESHOLD = 120
+# Seconds of silence after which a message starts a new conversation
+SILENCE_THRESHOLD = 7200
+
+# Relative error of the response-time percentiles
+SKETCH_ACCURACY = 0.01
+
+class QuantileSketch:
+    """
+    One log-bucketed histogram per key (DDSketch-style): a value v >= 1 is
+    counted in bucket ceil(log(v) / log(gamma)) + 1 and values below 1 in
+    bucket 0, so any quantile is known to within `accuracy` relative
+    error (bucket 0 reads as 0) from a few hundred counters per key,
+    however many values were added. Bucket counts of the same keys add
+    up, so a sketch of several chats is rebuilt from their concatenated
+    counts (see from_buckets).
+    """
+    def __init__(self, counts, accuracy=SKETCH_ACCURACY):
+        self.counts = counts
+        self.accuracy = accuracy
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+
+    @staticmethod
+    def buckets(values, accuracy=SKETCH_ACCURACY):
+        """The bucket of every one of the non-negative `values`."""
+        gamma = (1 + accuracy) / (1 - accuracy)
+        values = np.asarray(values, dtype=np.float64)
+        buckets = np.zeros(len(values), dtype=np.int64)
+        large = values >= 1
+        buckets[large] = np.ceil(np.log(values[large]) / np.log(gamma)).astype(np.int64) + 1
+        return buckets
+
+    @classmethod
+    def from_buckets(cls, keys, buckets, counts, n_keys, accuracy=SKETCH_ACCURACY):
+        """Rebuilds sketches from (key, bucket, count) entries; repeated entries add up."""
+        keys = np.asarray(keys, dtype=np.int64)
+        buckets = np.asarray(buckets, dtype=np.int64)
+        n_buckets = int(buckets.max()) + 1 if len(buckets) else 1
+        flat = np.bincount(keys * n_buckets + buckets, weights=counts, minlength=n_keys * n_buckets)
+        return cls(flat.astype(np.int64).reshape(n_keys, n_buckets), accuracy)
+
+    def quantile(self, q):
+        """The q-quantile of every key's values (NaN for keys without any)."""
+        cumulative = np.cumsum(self.counts, axis=1)
+        totals = cumulative[:, -1]
+        rank = q * np.maximum(totals - 1, 0)
+        bucket = (cumulative > rank[:, None]).argmax(axis=1)
+        # The middle of the bucket in relative terms, which bounds the error
+        estimate = np.where(bucket > 0, 2 * self.gamma ** (bucket - 1.0) / (self.gamma + 1), 0.0)
+        return np.where(totals > 0, estimate, np.nan)
+
+class Sessions:
+    """
+    The chat in time order, sessionized once: author codes, the seconds
+    since the previous message, which messages start a session (the first
+    one, any after SILENCE_THRESHOLD seconds of silence and any undated
+    one) and the session id of every message. Response times, reply
+    edges, conversation starters and session statistics are all read
+    from these arrays instead of each re-sorting the chat.
+    """
+    def __init__(self, order, codes, names, times, silence=SILENCE_THRESHOLD):
+        # Positions of the messages in time order, ties (minute timestamps) in file order
+        self.order = order
+        # Everything below is in time order
+        self.codes = codes
+        self.names = names
+        self.times = times
+        self.gaps = np.full(len(times), np.nan)
+        self.gaps[1:] = (times[1:] - times[:-1]) / np.timedelta64(1, 's')
+        # Whether the author differs from the previous message's
+        self.switch = np.zeros(len(codes), dtype=bool)
+        self.switch[1:] = codes[1:] != codes[:-1]
+        self.starts = ~(self.gaps <= silence)
+        self.ids = np.cumsum(self.starts) - 1
+
+    @classmethod
+    def from_frame(cls, df, silence=SILENCE_THRESHOLD):
+        """Sessionizes a parsed chat DataFrame (in any row order)."""
+        # Stable, so messages sent in the same minute keep their file order
+        order = df['DateTime'].reset_index(drop=True).sort_values(kind='stable').index.to_numpy()
+        codes, names = pd.factorize(df['Author'])
+        return cls(order, codes[order], np.asarray(names, dtype=object),
+                   df['DateTime'].to_numpy()[order], silence)
+
+    def replies(self, threshold):
+        """
+        Positions (in time order) of the messages that reply to the
+        previous one: a different author within `threshold` seconds.
+        """
+        return np.flatnonzero(self.switch & (self.gaps <= threshold))
+
+    def response_aggregate(self, window_minutes=RESPONSE_WINDOW_MINUTES):
+        """
+        The replies within `window_minutes` as (Author, Bucket, Count,
+        Seconds) rows: how many of each author's response times fell in
+        each QuantileSketch bucket and their total. Aggregates of several
+        chats concatenate into one (see response_table).
+        """
+        replies = self.replies(window_minutes * 60)
+        gaps = self.gaps[replies]
+        buckets = QuantileSketch.buckets(gaps)
+        n_buckets = int(buckets.max(initial=0)) + 1
+        keys, inverse = np.unique(self.codes[replies] * n_buckets + buckets, return_inverse=True)
+        codes, buckets = np.divmod(keys, n_buckets)
+        return pd.DataFrame({
+            'Author': self.names[codes].astype(object),
+            'Bucket': buckets.astype(np.int32),
+            'Count': np.bincount(inverse, minlength=len(keys)).astype(np.int64),
+            'Seconds': np.bincount(inverse, weights=gaps, minlength=len(keys)),
+        })
+
+    def response_times(self, window_minutes=RESPONSE_WINDOW_MINUTES):
+        """
+        Mean and median, 90th and 99th percentile response time in minutes
+        per author, fastest first. Only replies within `window_minutes`
+        count; longer gaps (e.g. overnight) would skew them.
+        """
+        return response_table(self.response_aggregate(window_minutes))
+
+    def reply_graph(self, threshold=REPLY_THRESHOLD):
+        """
+        Weighted reply adjacency matrix: rows are the replying author, columns
+        the author replied to, values the number of messages sent within
+        `threshold` seconds of a message from a different author.
+        """
+        replies = self.replies(threshold)
+        pairs = pd.DataFrame({'Author': self.names[self.codes[replies]],
+                              'RepliedTo': self.names[self.codes[replies - 1]]})
+        counts = pairs.groupby(['Author', 'RepliedTo'], sort=False).size()
+        return counts.unstack(fill_value=0)
+
+    def conversation_starters(self):
+        """How often each author starts a session."""
+        starters = pd.Series(self.names[self.codes[self.starts]], dtype=object).value_counts().reset_index()
+        starters.columns = ['Author', 'Count']
+        return starters
+
+    def session_table(self):
+        """One row per session: its start, end, length, messages, participants and starter."""
+        first = np.flatnonzero(self.starts)
+        last = np.append(first[1:] - 1, len(self.times) - 1) if len(first) else first
+        # Distinct (session, author) pairs give the participants of each session
+        pairs = np.unique(self.ids * max(len(self.names), 1) + self.codes)
+        return pd.DataFrame({
+            'Start': self.times[first],
+            'End': self.times[last],
+            'Minutes': (self.times[last] - self.times[first]) / np.timedelta64(1, 'm'),
+            'Messages': np.bincount(self.ids, minlength=len(first)),
+            'Participants': np.bincount(pairs // max(len(self.names), 1), minlength=len(first)),
+            'Starter': self.names[self.codes[first]],
+        })
+
+    def session_stats(self):
+        """Summary of the dated sessions' lengths, as a (Statistic, Value) DataFrame."""
+        table = self.session_table()
+        table = table[table['Start'].notna()]
+        messages, minutes = table['Messages'], table['Minutes']
+        stats = {
+            'Sessions': len(table),
+            'Messages per Session (mean)': messages.mean(),
+            'Messages per Session (median)': messages.median(),
+            'Messages per Session (p90)': messages.quantile(0.9),
+            'Session Length, min (median)': minutes.median(),
+            'Session Length, min (p90)': minutes.quantile(0.9),
+            'Single-Message Sessions (%)': (messages == 1).mean() * 100,
+        }
+        return pd.DataFrame({'Statistic': list(stats), 'Value': list(stats.values())})
+
+def response_table(aggregate):
+    """
+    Sessions.response_times() output from response_aggregate() rows, which
+    may repeat an (Author, Bucket) pair, e.g. when they come from several
+    chats.
+    """
+    codes, names = pd.factorize(aggregate['Author'])
+    counts = np.bincount(codes, weights=aggregate['Count'], minlength=len(names))
+    seconds = np.bincount(codes, weights=aggregate['Seconds'], minlength=len(names))
+    sketch = QuantileSketch.from_buckets(codes, aggregate['Bucket'], aggregate['Count'], len(names))
+
+    stats = pd.DataFrame({
+        'Author': np.asarray(names, dtype=object),
+        'Mean Response (min)': seconds / np.maximum(counts, 1) / 60,
+        'Median (min)': sketch.quantile(0.5) / 60,
+        'P90 (min)': sketch.quantile(0.9) / 60,
+        'P99 (min)': sketch.quantile(0.99) / 60,
+        'Replies': counts.astype(np.int64),
+    })
+    return stats[counts > 0].sort_values('Mean Response (min)', kind='stable').reset_index(drop=True)
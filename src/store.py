@@ -0,0 +1,193 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Columnar copy of a parsed chat lives next to the export in <export>.store/:
+# one Parquet file per ingest (part-00000.parquet, ...), the aggregates
+# computed for each part (totals-00000.parquet, words-00000.parquet,
+# search-00000.parquet, ...), aggregates of the whole chat (<name>.parquet)
+# plus meta.json
+STORE_SUFFIX = '.store'
+META_FILE = 'meta.json'
+# Stores written by an older layout are rebuilt from the export
+FORMAT_VERSION = 5
+
+def store_path(file_path):
+    """Returns the directory holding the columnar copy of `file_path`."""
+    return file_path + STORE_SUFFIX
+
+def file_fingerprint(file_path):
+    """Cheap identity of a file on disk: its size and modification time."""
+    stat = os.stat(file_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def prefix_hash(data, length):
+    """Hash of the first `length` bytes of an export."""
+    with memoryview(data) as view, view[:length] as prefix:
+        return hashlib.blake2b(prefix, digest_size=16).hexdigest()
+
+def read_meta(path):
+    """
+    Returns the store's metadata dict, or None if there is no store (or it
+    has an outdated layout).
+    """
+    try:
+        with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == FORMAT_VERSION else None
+
+def _write_meta(path, meta):
+    tmp_path = os.path.join(path, f"{META_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dict(meta, version=FORMAT_VERSION), f)
+    os.replace(tmp_path, os.path.join(path, META_FILE))
+
+def _write_part(df, path, index):
+    """
+    Writes one slice of a parsed chat as Parquet: DateTime as int64
+    nanoseconds since the epoch (NaT as the int64 minimum), Author
+    dictionary-encoded, Message as plain strings and Flags as uint16.
+    """
+    authors = df['Author'].astype('category').array
+    table = pa.table({
+        'DateTime': pa.array(df['DateTime'].to_numpy(dtype='datetime64[ns]').view('int64')),
+        'Author': pa.DictionaryArray.from_arrays(pa.array(authors.codes, type=pa.int32()),
+                                                 pa.array(authors.categories.to_numpy(dtype=object), type=pa.string())),
+        'Message': pa.array(df['Message'], type=pa.string()),
+        'Flags': pa.array(df['Flags'].to_numpy(dtype='uint16')),
+    })
+    pq.write_table(table, os.path.join(path, f"part-{index:05d}.parquet"), compression='zstd')
+
+def _aggregate_table(df):
+    """An aggregate DataFrame as an Arrow table, its text columns dictionary-encoded."""
+    columns = {}
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            columns[col] = pa.array(df[col].to_numpy())
+        else:
+            columns[col] = pa.array(df[col].to_numpy(dtype=object), type=pa.string()).dictionary_encode()
+    return pa.table(columns)
+
+def _write_index(df, path, name, index):
+    """Writes an aggregate of one part."""
+    pq.write_table(_aggregate_table(df), os.path.join(path, f"{name}-{index:05d}.parquet"), compression='zstd')
+
+def save_chat(df, path, meta, indexes=None):
+    """
+    Replaces the store at `path` with `df` as its only part. `indexes` maps
+    names to aggregate DataFrames of `df` stored alongside it.
+    """
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.makedirs(path)
+    _write_part(df, path, 0)
+    for name, index_df in (indexes or {}).items():
+        _write_index(index_df, path, name, 0)
+    _write_meta(path, dict(meta, parts=1))
+
+def append_chat(df, path, meta, indexes=None):
+    """
+    Adds `df` (and its `indexes`) as a new part after the existing ones and
+    replaces the metadata. Only the new messages are written.
+    """
+    parts = read_meta(path)['parts']
+    _write_part(df, path, parts)
+    for name, index_df in (indexes or {}).items():
+        _write_index(index_df, path, name, parts)
+    # The metadata is written last, so an interrupted append leaves the
+    # previous (still consistent) part count in place
+    _write_meta(path, dict(meta, parts=parts + 1))
+
+def update_meta(path, meta):
+    """Replaces the metadata of the store at `path`, keeping its parts."""
+    _write_meta(path, dict(meta, parts=read_meta(path)['parts']))
+
+def load_chat(path, fingerprint=None):
+    """
+    Memory-maps a stored chat and returns it as a DataFrame in the compact
+    schema (see parser.records_to_frame), or None if the store is missing
+    or (with `fingerprint`) was built from another export.
+    """
+    meta = read_meta(path)
+    if meta is None:
+        return None
+    if fingerprint is not None and meta.get('fingerprint') != fingerprint:
+        return None
+
+    files = sorted(glob.glob(os.path.join(path, 'part-*.parquet')))[:meta['parts']]
+    # Each part has its own Author dictionary; unified, they become one categorical
+    table = pa.concat_tables([pq.read_table(f, memory_map=True) for f in files]).unify_dictionaries()
+    # The unified dictionary is in order of first appearance; a parse sorts it
+    authors = table.column('Author').to_pandas()
+    authors = authors.cat.reorder_categories(authors.cat.categories.sort_values())
+
+    return pd.DataFrame({
+        'DateTime': table.column('DateTime').to_numpy().view('datetime64[ns]'),
+        'Author': authors,
+        'Message': table.column('Message').to_pandas(),
+        'Flags': table.column('Flags').to_numpy(),
+    })
+
+def message_count(path):
+    """Number of messages in the store at `path` (0 if there is none)."""
+    meta = read_meta(path)
+    if meta is None:
+        return 0
+    files = sorted(glob.glob(os.path.join(path, 'part-*.parquet')))[:meta['parts']]
+    return sum(pq.ParquetFile(f).metadata.num_rows for f in files)
+
+def load_index_table(path, name):
+    """
+    Returns the `name` aggregates of every part of the store as one Arrow
+    table, dictionary columns unified across parts, or None if there is no
+    store.
+    """
+    meta = read_meta(path)
+    if meta is None:
+        return None
+
+    files = sorted(glob.glob(os.path.join(path, f"{name}-*.parquet")))[:meta['parts']]
+    if not files:
+        return None
+    return pa.concat_tables([pq.read_table(f, memory_map=True) for f in files]).unify_dictionaries()
+
+def load_index(path, name):
+    """
+    Returns the `name` aggregates of every part of the store as one
+    DataFrame (a key may appear once per part), or None if there is no
+    store.
+    """
+    table = load_index_table(path, name)
+    return None if table is None else _aggregate_frame(table)
+
+def _aggregate_frame(table):
+    """An aggregate table as a DataFrame, dictionary columns as plain strings."""
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.string()))
+    return table.to_pandas()
+
+def save_aggregate(df, path, name):
+    """
+    Stores `df` as the `name` aggregate of the whole chat at `path`,
+    replacing the previous one. Unlike the per-part indexes it is not
+    appended to, so it is rewritten whenever the chat changes.
+    """
+    tmp_path = os.path.join(path, f"{name}.parquet.{os.getpid()}.tmp")
+    pq.write_table(_aggregate_table(df), tmp_path, compression='zstd')
+    os.replace(tmp_path, os.path.join(path, f"{name}.parquet"))
+
+def load_aggregate(path, name):
+    """The `name` aggregate of the whole chat at `path`, or None if it was never saved."""
+    try:
+        table = pq.read_table(os.path.join(path, f"{name}.parquet"), memory_map=True)
+    except FileNotFoundError:
+        return None
+    return _aggregate_frame(table)
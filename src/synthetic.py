@@ -0,0 +1,144 @@
+import argparse
+import numpy as np
+
+# Lines are formatted and written in blocks of this many messages
+BLOCK_SIZE = 100_000
+
+PLATFORMS = ('ios', 'android')
+
+FIRST_NAMES = [
+    'Aarav', 'Ali', 'Amelia', 'Ana', 'Ben', 'Chloe', 'Daniel', 'Emma', 'Fatima', 'Hamza', 'Hana', 'Isha',
+    'Jack', 'Kabir', 'Leo', 'Maya', 'Mei', 'Noah', 'Omar', 'Priya', 'Ravi', 'Sara', 'Tom', 'Zara',
+]
+LAST_NAMES = ['Khan', 'Smith', 'Patel', 'Garcia', 'Chen', 'Ali', 'Brown', 'Singh', 'Silva', 'Nguyen']
+
+COMMON_WORDS = (
+    'the to and you it is that of for in on me my this we are was be so just have not but what with '
+    'yes no ok okay lol haha hai kya nahi bhi good time today tomorrow now later here there come going '
+    'really think know want need like love see make sure right well done thanks please sorry'
+).split()
+TOPIC_WORDS = (
+    'football match goal team league score player exam study class homework teacher lecture notes '
+    'dinner pizza restaurant cooking recipe lunch food movie netflix series episode actor cinema '
+    'trip flight hotel beach travel ticket vacation office meeting project deadline client email '
+    'birthday party gift cake music concert song guitar weather rain sunny cold gym workout run'
+).split()
+
+# Single and multi-codepoint emojis (skin tones, ZWJ sequences, keycaps, flags)
+EMOJIS = ['😂', '❤️', '👍', '🙏', '😭', '🔥', '😊', '🎉', '👍🏽', '👨‍👩‍👧', '1️⃣', '🇮🇳', '🤣', '😍', '💯']
+
+IOS_MEDIA = ['image omitted', 'video omitted', 'sticker omitted', 'audio omitted', 'GIF omitted']
+ANDROID_MEDIA = ['<Media omitted>']
+LINKS = ['https://youtu.be/dQw4w9WgXcQ', 'https://example.com/article', 'http://maps.google.com/?q=cafe']
+
+def _vocabulary(rng, size=2000):
+    """Common chat words first, then topic words and made-up words."""
+    letters = np.array(list('abcdefghijklmnopqrstuvwxyz'))
+    made_up = [''.join(rng.choice(letters, rng.integers(3, 9))) for _ in range(size)]
+    return np.array(COMMON_WORDS + TOPIC_WORDS + made_up, dtype=object)
+
+def _participants(rng, n):
+    names = [f"{first} {last}" for last in LAST_NAMES for first in FIRST_NAMES]
+    picked = rng.choice(len(names), size=min(n, len(names)), replace=False)
+    names = [names[i] for i in picked]
+    # More participants than name combinations get numbered
+    names += [f"Member {i}" for i in range(len(names), n)]
+    return names
+
+def _timestamp_strings(times, platform):
+    """Formats datetime64[s] values the way the export writes its headers."""
+    days = times.astype('datetime64[D]')
+    years = days.astype('datetime64[Y]').astype(np.int64) + 1970
+    months = days.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    dom = (days - days.astype('datetime64[M]')).astype(np.int64) + 1
+    secs = (times - days).astype(np.int64)
+    hours, minutes, seconds = secs // 3600, secs // 60 % 60, secs % 60
+
+    if platform == 'ios':
+        return [f"[{d:02d}/{m:02d}/{y % 100:02d}, {h:02d}:{mi:02d}:{s:02d}]"
+                for d, m, y, h, mi, s in zip(dom, months, years, hours, minutes, seconds)]
+    return [f"{d:02d}/{m:02d}/{y:04d}, {h:02d}:{mi:02d}"
+            for d, m, y, h, mi in zip(dom, months, years, hours, minutes)]
+
+def generate_chat(path, n_messages, participants=8, platform='ios', multiline_ratio=0.05,
+                  emoji_density=0.15, media_ratio=0.05, link_ratio=0.01, seed=0, start='2020-01-01'):
+    """
+    Writes a synthetic WhatsApp export of `n_messages` messages to `path`.
+    The same arguments always give the same file. Authors follow a skewed
+    (Zipf-like) activity distribution, words a Zipf distribution over a
+    fixed vocabulary, and messages come in bursts separated by silences.
+    `multiline_ratio`, `emoji_density`, `media_ratio` and `link_ratio` are
+    the shares of messages with a second line, emojis, a media placeholder
+    and a link.
+    """
+    if platform not in PLATFORMS:
+        raise ValueError(f"platform must be one of {PLATFORMS}, not {platform!r}")
+
+    rng = np.random.default_rng(seed)
+    vocab = _vocabulary(rng)
+    names = _participants(rng, participants)
+    activity = 1 / np.arange(1, len(names) + 1) ** 0.8
+    activity /= activity.sum()
+    media = IOS_MEDIA if platform == 'ios' else ANDROID_MEDIA
+    # iOS marks media placeholders and notices with a left-to-right mark
+    mark = '\u200e' if platform == 'ios' else ''
+    sep = ' ' if platform == 'ios' else ' - '
+    current = np.datetime64(start, 's')
+
+    with open(path, 'w', encoding='utf-8') as f:
+        # The encryption notice: from the group on iOS, a line without an author on Android
+        notice = ('Messages and calls are end-to-end encrypted. No one outside of this chat, '
+                  'not even WhatsApp, can read or listen to them.')
+        stamp = _timestamp_strings(np.array([current]), platform)[0]
+        f.write(f"{stamp} Group Chat: {mark}{notice}\n" if platform == 'ios' else f"{stamp} - {notice}\n")
+
+        for offset in range(0, n_messages, BLOCK_SIZE):
+            n = min(BLOCK_SIZE, n_messages - offset)
+            # Mostly quick replies, sometimes a silence of hours
+            gaps = np.where(rng.random(n) < 0.03, rng.exponential(6 * 3600, n), rng.exponential(45, n))
+            times = current + np.cumsum(gaps.astype(np.int64) + 1).astype('timedelta64[s]')
+            current = times[-1]
+
+            authors = rng.choice(len(names), size=n, p=activity)
+            lengths = rng.integers(1, 13, size=n)
+            word_ids = np.minimum(rng.zipf(1.3, size=lengths.sum()) - 1, len(vocab) - 1)
+            bounds = np.concatenate([[0], np.cumsum(lengths)])
+            kinds = rng.random(n)
+            picks = rng.random(n)
+            with_emojis = rng.random(n) < emoji_density
+            emoji_counts = rng.integers(1, 4, size=n)
+            emoji_picks = rng.integers(0, len(EMOJIS), size=(n, 3))
+            stamps = _timestamp_strings(times, platform)
+
+            lines = []
+            for i in range(n):
+                if kinds[i] < media_ratio:
+                    text = mark + media[int(picks[i] * len(media))]
+                else:
+                    text = ' '.join(vocab[word_ids[bounds[i]:bounds[i + 1]]])
+                    if kinds[i] < media_ratio + link_ratio:
+                        text += ' ' + LINKS[int(picks[i] * len(LINKS))]
+                    if with_emojis[i]:
+                        text += ' ' + ''.join(EMOJIS[j] for j in emoji_picks[i, :emoji_counts[i]])
+                    if kinds[i] > 1 - multiline_ratio:
+                        text += '\n' + ' '.join(vocab[word_ids[bounds[i]:bounds[i + 1]]][::-1])
+                lines.append(f"{stamps[i]}{sep}{names[authors[i]]}: {text}\n")
+            f.write(''.join(lines))
+
+if __name__ == "__main__":
+    # Usage: python synthetic.py out.txt --messages 100000 --platform android
+    cli = argparse.ArgumentParser(description="Writes a deterministic synthetic WhatsApp export.")
+    cli.add_argument('path')
+    cli.add_argument('--messages', type=int, default=100_000)
+    cli.add_argument('--participants', type=int, default=8)
+    cli.add_argument('--platform', choices=PLATFORMS, default='ios')
+    cli.add_argument('--multiline-ratio', type=float, default=0.05)
+    cli.add_argument('--emoji-density', type=float, default=0.15)
+    cli.add_argument('--media-ratio', type=float, default=0.05)
+    cli.add_argument('--link-ratio', type=float, default=0.01)
+    cli.add_argument('--seed', type=int, default=0)
+    args = cli.parse_args()
+
+    generate_chat(args.path, args.messages, args.participants, args.platform, args.multiline_ratio,
+                  args.emoji_density, args.media_ratio, args.link_ratio, args.seed)
+    print(f"Wrote {args.messages:,} messages to {args.path}")
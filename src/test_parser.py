@@ -0,0 +1,235 @@
+import numpy as np
+import pandas as pd
+import pytest
+from classify import classify
+from parser import Dialect, WhatsAppParser, decode_timestamps, detect_dialect, ingest, parse_text
+from search import SearchIndex, search
+from store import read_meta
+from totals import ChatTotals
+from words import WordIndex
+
+# One header per dialect, formatted from (day, month, year, hour, minute, second)
+HEADERS = {
+    'ios': lambda d, m, y, H, M, S: f"[{d:02d}/{m:02d}/{y % 100:02d}, {H:02d}:{M:02d}:{S:02d}] ",
+    'android_12h': lambda d, m, y, H, M, S: f"{m}/{d}/{y}, {(H - 1) % 12 + 1}:{M:02d} {'PM' if H >= 12 else 'AM'} - ",
+}
+
+def _chat_lines(header, n=4000):
+    """`n` messages from three authors, Carol first appearing halfway, every 10th one multi-line."""
+    lines = []
+    for i in range(n):
+        author = ('Alice', 'Bob', 'Carol')[i % 3] if i >= n // 2 else ('Alice', 'Bob')[i % 2]
+        minutes = i * 7
+        # Days from the 13th, so the detection sample tells dd/mm from mm/dd
+        stamp = header(13 + minutes // 1440 % 15, 1 + minutes // 21600 % 12, 2021,
+                       minutes // 60 % 24, minutes % 60, i % 60)
+        lines.append(f"{stamp}{author}: message number {i}")
+        if i % 10 == 0:
+            lines.append(f"second line of {i}")
+    return lines
+
+@pytest.mark.parametrize('platform', sorted(HEADERS))
+def test_parallel_parse_equals_serial(tmp_path, platform):
+    path = tmp_path / '_chat.txt'
+    path.write_text('\n'.join(_chat_lines(HEADERS[platform])) + '\n', encoding='utf-8')
+
+    serial = WhatsAppParser(str(path)).parse()
+    parallel = WhatsAppParser(str(path)).parse(workers=4)
+
+    assert len(serial) == 4000
+    assert not serial['DateTime'].isna().any()
+    assert list(serial['Author'].cat.categories) == ['Alice', 'Bob', 'Carol']
+    pd.testing.assert_frame_equal(parallel, serial)
+    pd.testing.assert_frame_equal(parse_text(path.read_text(encoding='utf-8')), serial)
+
+def test_parallel_parse_of_tiny_file(tmp_path):
+    path = tmp_path / '_chat.txt'
+    path.write_text('[01/02/21, 10:00:00] Alice: hi\n', encoding='utf-8')
+
+    df = WhatsAppParser(str(path)).parse(workers=4)
+
+    assert df['Message'].tolist() == ['hi']
+    assert df['DateTime'].tolist() == [pd.Timestamp('2021-02-01 10:00:00')]
+
+@pytest.mark.parametrize('line, expected, stamp', [
+    ('[13/02/21, 09:05:07] Alice: hi', ('bracketed', '%d/%m/%y, %H:%M:%S'), '2021-02-13 09:05:07'),
+    # Newer iOS exports put a narrow no-break space before AM/PM
+    ('[13/02/2021, 9:05:07\u202fPM] Alice: hi', ('bracketed', '%d/%m/%Y, %I:%M:%S\u202f%p'), '2021-02-13 21:05:07'),
+    ('13/02/2021, 21:05 - Alice: hi', ('dash', '%d/%m/%Y, %H:%M'), '2021-02-13 21:05:00'),
+    ('2/13/21, 9:05 PM - Alice: hi', ('dash', '%m/%d/%y, %I:%M %p'), '2021-02-13 21:05:00'),
+])
+def test_dialects(line, expected, stamp):
+    dialect = detect_dialect([line])
+    df = parse_text(line + '\n')
+
+    assert (dialect.layout, dialect.datetime_format) == expected
+    assert df['Author'].tolist() == ['Alice']
+    assert df['Message'].tolist() == ['hi']
+    assert df['DateTime'].tolist() == [pd.Timestamp(stamp)]
+
+def _us_lines(start, n, step_minutes=13):
+    """`n` mm/dd 12h Android headers every `step_minutes` from `start`."""
+    lines = []
+    for i in range(n):
+        t = (np.datetime64(start) + np.timedelta64(i * step_minutes, 'm')).astype(object)
+        clock = f"{(t.hour - 1) % 12 + 1}:{t.minute:02d} {'PM' if t.hour >= 12 else 'AM'}"
+        lines.append(f"{t.month}/{t.day}/{t.year % 100}, {clock} - Alice: message {i}")
+    return lines
+
+def test_day_order_is_settled_past_the_sample(tmp_path):
+    # 3,000 messages from 1 March: the first 500 lines never pass the 12th
+    lines = _us_lines('2021-03-01T09:10', 3000)
+    path = tmp_path / '_chat.txt'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    expected = pd.Timestamp('2021-03-01 09:10') + pd.to_timedelta(np.arange(3000) * 13, unit='m')
+
+    assert detect_dialect(lines[:500]).day_first
+    for df in (parse_text(path.read_text(encoding='utf-8')), WhatsAppParser(str(path)).parse(),
+               WhatsAppParser(str(path)).parse(workers=3)):
+        assert df['DateTime'].tolist() == list(expected)
+
+def test_ambiguous_store_is_reparsed_when_the_day_order_shows(tmp_path):
+    lines = _us_lines('2021-03-01T09:10', 600, step_minutes=30)
+    first = ('\n'.join(lines[:300]) + '\n').encode('utf-8')
+    full = ('\n'.join(lines) + '\n').encode('utf-8')
+    path = str(tmp_path / 'chat.store')
+
+    ingest(first, path, 'v1')
+    # Days 1 to 7 only: the guess is dd/mm
+    assert read_meta(path)['dialect']['day_first']
+    df, _ = ingest(full, path, 'v2')
+
+    assert not read_meta(path)['dialect']['day_first']
+    assert df['DateTime'].iloc[0] == pd.Timestamp('2021-03-01 09:10')
+    assert df['DateTime'].iloc[-1] == pd.Timestamp('2021-03-13 20:40')
+    assert not df['DateTime'].isna().any()
+
+def test_non_padded_twelve_hour_timestamps():
+    dialect = Dialect('dash', day_first=False, year_digits=4, seconds=False, twelve_hour=True)
+    values = ['1/5/2021, 9:03 AM', '12/25/2021, 12:00 AM', '3/14/2021, 12:30 PM', '10/1/2021, 11:59 pm']
+
+    decoded = decode_timestamps(values, dialect)
+
+    assert list(pd.to_datetime(decoded)) == [
+        pd.Timestamp('2021-01-05 09:03'), pd.Timestamp('2021-12-25 00:00'),
+        pd.Timestamp('2021-03-14 12:30'), pd.Timestamp('2021-10-01 23:59'),
+    ]
+
+def test_invalid_dates_are_nat():
+    dialect = Dialect('bracketed', day_first=True, year_digits=2, seconds=True)
+    values = ['31/02/21, 10:00:00', '29/02/23, 10:00:00', '29/02/24, 10:00:00', '01/13/21, 10:00:00',
+              '00/01/21, 10:00:00', '01/01/21, 24:00:00', '01/01/21, 10:60:00', '01/01/21, 10:00']
+
+    decoded = pd.to_datetime(decode_timestamps(values, dialect))
+
+    assert decoded.isna().tolist() == [True, True, False, True, True, True, True, True]
+    assert decoded[2] == pd.Timestamp('2024-02-29 10:00:00')
+
+    # Years datetime64[ns] cannot hold, and the edges of its range
+    dialect = Dialect('bracketed', day_first=True, year_digits=4, seconds=True)
+    values = ['01/01/3000, 10:00:00', '01/01/1600, 10:00:00', '21/09/1677, 00:12:43', '21/09/1677, 00:12:44',
+              '11/04/2262, 23:47:16', '11/04/2262, 23:47:17']
+
+    decoded = pd.to_datetime(decode_timestamps(values, dialect))
+
+    assert decoded.isna().tolist() == [True, True, True, False, False, True]
+    assert decoded[3] == pd.Timestamp('1677-09-21 00:12:44')
+    assert decoded[4] == pd.Timestamp('2262-04-11 23:47:16')
+
+def test_invalid_twelve_hour_clock_is_nat():
+    dialect = Dialect('dash', seconds=False, twelve_hour=True)
+    values = ['01/01/21, 0:15 AM', '01/01/21, 13:15 PM', '01/01/21, 12:15 AM']
+
+    decoded = pd.to_datetime(decode_timestamps(values, dialect))
+
+    assert decoded.isna().tolist() == [True, True, False]
+    assert decoded[2] == pd.Timestamp('2021-01-01 00:15')
+
+@pytest.mark.parametrize('dialect', [
+    Dialect('bracketed', day_first=True, year_digits=2, seconds=True),
+    Dialect('dash', day_first=False, year_digits=4, seconds=False, twelve_hour=True),
+    Dialect('bracketed', day_first=True, year_digits=4, seconds=True, twelve_hour=True, ampm_sep='\u202f'),
+], ids=repr)
+def test_decode_matches_pandas(dialect):
+    # Random fields, unpadded half the time and a little out of range, so
+    # invalid dates and mixed digit layouts are both exercised
+    rng = np.random.default_rng(0)
+    n = 50_000
+    day, month = rng.integers(0, 33, n), rng.integers(0, 14, n)
+    year = rng.integers(0, 100, n) if dialect.year_digits == 2 else rng.integers(1990, 2040, n)
+    hour = rng.integers(0, 14, n) if dialect.twelve_hour else rng.integers(0, 25, n)
+    minute, sec = rng.integers(0, 61, n), rng.integers(0, 60, n)
+    padded = rng.random(n) < 0.5
+
+    values = []
+    for i in range(n):
+        first, second = (day[i], month[i]) if dialect.day_first else (month[i], day[i])
+        width = 2 if padded[i] else 1
+        value = f"{first:0{width}d}/{second:0{width}d}/{year[i]:0{dialect.year_digits}d}, {hour[i]:0{width}d}:{minute[i]:02d}"
+        if dialect.seconds:
+            value += f":{sec[i]:02d}"
+        if dialect.twelve_hour:
+            value += dialect.ampm_sep + ('AM', 'PM')[i % 2]
+        values.append(value)
+
+    expected = pd.to_datetime(pd.Series(values), format=dialect.datetime_format, errors='coerce')
+    decoded = pd.Series(decode_timestamps(values, dialect))
+
+    assert expected.isna().any() and expected.notna().any()
+    pd.testing.assert_series_equal(decoded, expected.astype('datetime64[ns]'))
+
+def _export(lines):
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+def _full_parse(data):
+    df = parse_text(data.decode('utf-8'))
+    df['Flags'] = classify(df['Message'])
+    return df
+
+def _sorted_counts(totals):
+    return totals.to_counts().sort_values(['Author', 'Day', 'Hour']).reset_index(drop=True)
+
+def test_appended_export_equals_full_parse(tmp_path):
+    lines = _chat_lines(HEADERS['ios'])
+    # Cut before a header line, as a later re-export only adds messages
+    cut = next(i for i in range(len(lines) // 2, len(lines)) if lines[i].startswith('['))
+    full = _export(lines)
+    path = str(tmp_path / 'chat.store')
+
+    ingest(_export(lines[:cut]), path, 'v1')
+    df, totals = ingest(full, path, 'v2')
+    expected = _full_parse(full)
+
+    assert read_meta(path)['parts'] == 2
+    pd.testing.assert_frame_equal(df, expected)
+    pd.testing.assert_frame_equal(_sorted_counts(totals), _sorted_counts(ChatTotals.from_frame(expected)))
+    pd.testing.assert_series_equal(WordIndex.load(path).frequencies().sort_index(),
+                                   WordIndex.from_frame(expected).frequencies().sort_index())
+    stored, fresh = SearchIndex.load(path, len(df)), SearchIndex.from_frame(expected)
+    for query in ('message', 'second line', '"number 3999"', 'line of 10', 'Carol'):
+        assert search(df, stored, query).tolist() == search(expected, fresh, query).tolist()
+
+def test_blank_tail_appends_nothing(tmp_path):
+    data = _export(_chat_lines(HEADERS['ios'], n=200))
+    path = str(tmp_path / 'chat.store')
+
+    ingest(data, path, 'v1')
+    df, _ = ingest(data + b'\n  \n\n', path, 'v2')
+
+    assert read_meta(path)['parts'] == 1
+    assert read_meta(path)['fingerprint'] == 'v2'
+    pd.testing.assert_frame_equal(df, _full_parse(data))
+
+def test_extended_last_message_is_parsed_again(tmp_path):
+    lines = _chat_lines(HEADERS['ios'], n=200)
+    cut = next(i for i in range(100, len(lines)) if lines[i].startswith('['))
+    # The re-export continues the last stored message before adding new ones
+    data = _export(lines[:cut] + ['more of the same message'] + lines[cut:])
+    path = str(tmp_path / 'chat.store')
+
+    ingest(_export(lines[:cut]), path, 'v1')
+    df, _ = ingest(data, path, 'v2')
+
+    assert read_meta(path)['parts'] == 1
+    assert df['Message'].str.endswith('more of the same message').sum() == 1
+    pd.testing.assert_frame_equal(df, _full_parse(data))
@@ -0,0 +1,130 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from sessions import SILENCE_THRESHOLD, Sessions
+from words import STOPWORDS as CHAT_STOPWORDS
+
+# Longer conversations are cut into documents of at most this many messages
+MAX_DOCUMENT_MESSAGES = 200
+
+def conversations(df, threshold=SILENCE_THRESHOLD, max_messages=MAX_DOCUMENT_MESSAGES):
+    """
+    Groups messages into conversations split on silences longer than
+    `threshold` seconds (and every `max_messages` messages) and returns a
+    DataFrame with one row per conversation: its start time and all of its
+    text joined.
+    """
+    sessions = Sessions.from_frame(df, threshold)
+    order, times, starts = sessions.order, sessions.times, sessions.starts
+
+    # Position of each message within its conversation
+    rows = np.arange(len(times))
+    position = rows - np.maximum.accumulate(np.where(starts, rows, 0))
+    bounds = np.flatnonzero(starts | (position % max_messages == 0))
+
+    messages = df['Message'].iloc[order].tolist()
+    ends = list(bounds[1:]) + [len(messages)]
+    return pd.DataFrame({
+        'Start': times[bounds],
+        'Text': [' '.join(messages[a:b]) for a, b in zip(bounds, ends)],
+    })
+
+class TopicModel:
+    """
+    Online LDA over conversation documents. The vocabulary is bounded
+    (`max_features` words learned from at most `vocab_sample` documents)
+    and documents are fed in mini-batches with partial_fit, so memory and
+    fit time per batch stay flat however long the chat is. update() only
+    consumes messages newer than the ones already seen.
+    """
+    def __init__(self, n_topics=8, max_features=5000, batch_size=512, vocab_sample=20000, random_state=0):
+        # scikit-learn takes about a second to import, so only a model loads it
+        from sklearn.decomposition import LatentDirichletAllocation
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, CountVectorizer
+
+        self.n_topics = n_topics
+        self.batch_size = batch_size
+        self.vocab_sample = vocab_sample
+        # English stopwords plus the chat filler words the word index skips
+        stopwords = list(ENGLISH_STOP_WORDS | CHAT_STOPWORDS)
+        self.vectorizer = CountVectorizer(max_features=max_features, stop_words=stopwords,
+                                          token_pattern=r'(?u)\b[^\W\d_]{3,}\b', max_df=0.5)
+        self.lda = LatentDirichletAllocation(n_components=n_topics, learning_method='online',
+                                             batch_size=batch_size, random_state=random_state)
+        self.topic_weights = np.zeros(n_topics)
+        self.n_documents = 0
+        # Time of the last message seen, and how many were sent at that time
+        self.watermark = None
+        self.at_watermark = 0
+        self.fitted = False
+
+    def update(self, df):
+        """
+        Partially fits the model on the messages after the watermark. The
+        rest of a conversation that was still open at the last update is
+        one new document.
+        """
+        times = df['DateTime'].to_numpy()
+        new = df
+        if self.watermark is not None:
+            # Exports have minute timestamps, so a new message can share the last one's time
+            same = times == self.watermark
+            new = df[(times > self.watermark) | (same & (np.cumsum(same) > getattr(self, 'at_watermark', 0)))]
+        docs = conversations(new)
+        if docs.empty:
+            return self
+
+        texts = docs['Text'].tolist()
+        if not self.fitted:
+            sample = texts
+            if len(texts) > self.vocab_sample:
+                rng = np.random.default_rng(0)
+                sample = [texts[i] for i in rng.choice(len(texts), self.vocab_sample, replace=False)]
+            try:
+                self.vectorizer.fit(sample)
+            except ValueError:
+                # Not a single usable word yet (e.g. only media messages)
+                return self
+
+        for i in range(0, len(texts), self.batch_size):
+            X = self.vectorizer.transform(texts[i:i + self.batch_size])
+            X = X[X.getnnz(axis=1) > 0]
+            if X.shape[0] == 0:
+                continue
+            self.lda.partial_fit(X)
+            self.fitted = True
+            self.topic_weights += self.lda.transform(X).sum(axis=0)
+            self.n_documents += X.shape[0]
+
+        if not np.isnat(times).all():
+            self.watermark = times[~np.isnat(times)].max()
+            self.at_watermark = int((times == self.watermark).sum())
+        return self
+
+    def topics(self, n_words=8):
+        """Top words and share of conversations per topic, most prevalent first."""
+        if not self.fitted:
+            return pd.DataFrame(columns=['Topic', 'Share', 'Words'])
+        words = self.vectorizer.get_feature_names_out()
+        rows = []
+        for k, component in enumerate(self.lda.components_):
+            top = words[np.argsort(component)[::-1][:n_words]]
+            rows.append((f"Topic {k + 1}", self.topic_weights[k] / max(self.n_documents, 1), ', '.join(top)))
+        return pd.DataFrame(rows, columns=['Topic', 'Share', 'Words']).sort_values('Share', ascending=False)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        """Returns the model saved at `path`, or None if there is none."""
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
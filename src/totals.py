@@ -0,0 +1,220 @@
+import numpy as np
+import pandas as pd
+from store import load_index
+
+DAYS_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# 1970-01-01, day 0 of the cube's calendar, was a Thursday
+_EPOCH_WEEKDAY = 3
+
+class ChatTotals:
+    """
+    Message counts in one (author x day x hour) NumPy cube, plus a count of
+    undated messages per author. Every time chart is a sum over some axes
+    of a slice of the cube, so filtering by participants or dates costs the
+    same however many messages the chat has. Totals of two disjoint slices
+    of a chat add up, so they are kept current as new messages arrive.
+    """
+    def __init__(self, authors=(), first_day=0, cube=None, undated=None):
+        self.authors = list(authors)
+        # Days since the epoch of the cube's first day
+        self.first_day = int(first_day)
+        self.cube = np.zeros((len(self.authors), 0, 24), dtype=np.int32) if cube is None else cube
+        self.undated = np.zeros(len(self.authors), dtype=np.int64) if undated is None else undated
+
+    @classmethod
+    def _from_codes(cls, authors, author_codes, days, hours, counts):
+        """Builds the cube from one (author, day, hour, count) entry per row; hour -1 is undated."""
+        dated = hours >= 0
+        # Integer accumulation: bincount weights would need a float64 copy of the cube
+        undated = np.zeros(len(authors), dtype=np.int64)
+        np.add.at(undated, author_codes[~dated], counts[~dated])
+        if not dated.any():
+            return cls(authors, 0, None, undated)
+
+        first_day = int(days[dated].min())
+        n_days = int(days[dated].max()) - first_day + 1
+        flat = (author_codes[dated] * n_days + (days[dated] - first_day)) * 24 + hours[dated]
+        cube = np.zeros(len(authors) * n_days * 24, dtype=np.int32)
+        np.add.at(cube, flat, counts[dated].astype(np.int32))
+        return cls(authors, first_day, cube.reshape(len(authors), n_days, 24), undated)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Counts the messages of a parsed chat DataFrame."""
+        author_codes, authors = pd.factorize(df['Author'])
+        ns = df['DateTime'].to_numpy(dtype='datetime64[ns]')
+        dated = ~np.isnat(ns)
+        since_epoch = np.where(dated, ns.astype('datetime64[h]').astype(np.int64), 0)
+        days = since_epoch // 24
+        hours = np.where(dated, since_epoch % 24, -1)
+        return cls._from_codes(list(authors), author_codes, days, hours, np.ones(len(df), dtype=np.int64))
+
+    @classmethod
+    def from_counts(cls, counts):
+        """Rebuilds the totals from to_counts() output (keys may repeat and add up)."""
+        author_codes, authors = pd.factorize(counts['Author'])
+        return cls._from_codes(list(authors), author_codes, counts['Day'].to_numpy(np.int64),
+                               counts['Hour'].to_numpy(np.int64), counts['Count'].to_numpy(np.int64))
+
+    @classmethod
+    def load(cls, path):
+        """The totals saved with the chat store at `path` (empty if there is none)."""
+        counts = load_index(path, 'totals')
+        return cls() if counts is None else cls.from_counts(counts)
+
+    def to_counts(self):
+        """
+        The non-empty cells as an (Author, Day, Hour, Count) DataFrame, Day
+        being days since the epoch. Undated messages have Hour -1.
+        """
+        a, d, h = np.nonzero(self.cube)
+        undated = np.flatnonzero(self.undated)
+        names = np.array(self.authors, dtype=object)
+        return pd.DataFrame({
+            'Author': np.concatenate([names[a], names[undated]]),
+            'Day': np.concatenate([d + self.first_day, np.zeros(len(undated), dtype=np.int64)]).astype(np.int32),
+            'Hour': np.concatenate([h, np.full(len(undated), -1)]).astype(np.int8),
+            'Count': np.concatenate([self.cube[a, d, h], self.undated[undated]]).astype(np.int32),
+        })
+
+    def __add__(self, other):
+        return ChatTotals.from_counts(pd.concat([self.to_counts(), other.to_counts()], ignore_index=True))
+
+    def drop_authors(self, names):
+        """Returns the totals without the given authors."""
+        names = set(names)
+        keep = [i for i, a in enumerate(self.authors) if a not in names]
+        return ChatTotals([self.authors[i] for i in keep], self.first_day, self.cube[keep], self.undated[keep])
+
+    def date_range(self):
+        """First and last day with messages as datetime64[D], or None if nothing is dated."""
+        days = np.flatnonzero(self.cube.sum(axis=(0, 2)))
+        if not days.size:
+            return None
+        return (np.datetime64(self.first_day + int(days[0]), 'D'),
+                np.datetime64(self.first_day + int(days[-1]), 'D'))
+
+    def select(self, authors=None, start=None, end=None):
+        """
+        Returns the totals of the given authors between the days `start`
+        and `end` (inclusive, anything numpy.datetime64 accepts; None for
+        no bound). A date bound leaves undated messages out.
+        """
+        if authors is None:
+            rows, names = slice(None), self.authors
+        else:
+            authors = set(authors)
+            rows = [i for i, a in enumerate(self.authors) if a in authors]
+            names = [self.authors[i] for i in rows]
+        undated = self.undated[rows]
+        lo, hi = 0, self.cube.shape[1]
+        if start is not None:
+            lo = min(max(_day_number(start) - self.first_day, 0), hi)
+            undated = np.zeros_like(undated)
+        if end is not None:
+            hi = max(min(_day_number(end) - self.first_day + 1, hi), lo)
+            undated = np.zeros_like(undated)
+        return ChatTotals(names, self.first_day + lo, self.cube[rows, lo:hi], undated)
+
+    def _weekdays(self):
+        """Day of the week (Monday = 0) of every day of the cube."""
+        return weekday_of(np.arange(self.cube.shape[1]) + self.first_day)
+
+    def user_counts(self):
+        """Messages and share of the chat per user, most active first."""
+        per_author = self.cube.sum(axis=(1, 2), dtype=np.int64) + self.undated
+        order = np.argsort(-per_author, kind='stable')
+        order = order[per_author[order] > 0]
+        counts = pd.DataFrame({'User': [self.authors[i] for i in order], 'Messages': per_author[order]})
+        counts['Percentage'] = (counts['Messages'] / counts['Messages'].sum() * 100).round(1)
+        return counts
+
+    def monthly_counts(self):
+        """Number of messages per calendar month."""
+        per_day = self.cube.sum(axis=(0, 2), dtype=np.int64)
+        days = np.arange(len(per_day)) + self.first_day
+        months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        if not len(months):
+            return pd.DataFrame({'YearMonth': pd.Series(dtype=object), 'Messages': pd.Series(dtype=np.int64)})
+        per_month = np.bincount(months - months[0], weights=per_day).astype(np.int64)
+        nonzero = np.flatnonzero(per_month)
+        labels = (nonzero + months[0]).astype('datetime64[M]').astype(str)
+        return pd.DataFrame({'YearMonth': labels.astype(object), 'Messages': per_month[nonzero]})
+
+    def timeline(self, freq='D'):
+        """
+        Number of messages per day ('D'), week starting Monday ('W') or
+        calendar month ('M') from the first to the last day of the cube,
+        empty bins included, as a (Date, Messages) DataFrame keyed by the
+        first day of each bin.
+        """
+        per_day = self.cube.sum(axis=(0, 2), dtype=np.int64)
+        return binned_timeline(np.arange(len(per_day)) + self.first_day, per_day, freq)
+
+    def _weekday_hours(self):
+        """Message counts as a (7 x 24) weekday-by-hour matrix."""
+        per_day_hour = self.cube.sum(axis=0, dtype=np.int64)
+        weekdays = self._weekdays()
+        matrix = np.zeros((7, 24), dtype=np.int64)
+        # Weekdays repeat every 7 days, so each one is a strided slice
+        for k in range(min(7, len(weekdays))):
+            matrix[weekdays[k]] = per_day_hour[k::7].sum(axis=0)
+        return matrix
+
+    def activity_heatmap(self):
+        """Message counts per (DayOfWeek, Hour) pair."""
+        return heatmap_table(self._weekday_hours())
+
+    def hourly_counts(self):
+        """Number of messages per hour of the day."""
+        hourly = self.cube.sum(axis=(0, 1), dtype=np.int64)
+        hours = np.flatnonzero(hourly)
+        return pd.DataFrame({'Hour': hours, 'Messages': hourly[hours]})
+
+    def daily_counts(self):
+        """Number of messages per day of the week, Monday first."""
+        daily = self._weekday_hours().sum(axis=1)
+        return pd.DataFrame({'Day': DAYS_ORDER, 'Messages': daily})
+
+def weekday_of(days):
+    """Day of the week (Monday = 0) of days since the epoch."""
+    return (np.asarray(days) + _EPOCH_WEEKDAY) % 7
+
+def heatmap_table(matrix):
+    """A (7 x 24) weekday-by-hour count matrix as activity_heatmap() rows."""
+    rows = [(DAYS_ORDER[d], h, int(matrix[d, h])) for d, h in zip(*np.nonzero(matrix))]
+    return pd.DataFrame(sorted(rows), columns=['DayOfWeek', 'Hour', 'Count'])
+
+def binned_timeline(days, counts, freq='D'):
+    """
+    ChatTotals.timeline() of message `counts` on `days` (days since the
+    epoch, in any order; a day may repeat), bins without messages included.
+    """
+    days = np.asarray(days, dtype=np.int64)
+    if freq not in ('D', 'W', 'M'):
+        raise ValueError(f"freq must be 'D', 'W' or 'M', not {freq!r}")
+    if not len(days):
+        return pd.DataFrame({'Date': pd.Series(dtype='datetime64[ns]'), 'Messages': pd.Series(dtype=np.int64)})
+    if freq == 'M':
+        keys = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    elif freq == 'W':
+        # Weeks since the Monday before the epoch
+        keys = (days + _EPOCH_WEEKDAY) // 7
+    else:
+        keys = days
+    bins = np.arange(keys.min(), keys.max() + 1)
+    messages = np.zeros(len(bins), dtype=np.int64)
+    np.add.at(messages, keys - bins[0], counts)
+    if freq == 'M':
+        dates = bins.astype('datetime64[M]')
+    elif freq == 'W':
+        # The Monday starting each week
+        dates = (bins * 7 - _EPOCH_WEEKDAY).astype('datetime64[D]')
+    else:
+        dates = bins.astype('datetime64[D]')
+    return pd.DataFrame({'Date': dates.astype('datetime64[ns]'), 'Messages': messages})
+
+def _day_number(value):
+    """Days since the epoch of a date-like value."""
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int64))
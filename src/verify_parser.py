@@ -1,8 +1,8 @@
 
+import sys
 from parser import WhatsAppParser
 
-def test_parser():
-    file_path = '../data/WhatsApp Chat with gg bOys.txt'
+def test_parser(file_path='../data/_chat.txt'):
     parser = WhatsAppParser(file_path)
     df = parser.parse()
     
@@ -19,4 +19,5 @@ def test_parser():
         print(df[df['DateTime'].isnull()])
 
 if __name__ == "__main__":
-    test_parser()
+    # Usage: python verify_parser.py [chat.txt]
+    test_parser(*sys.argv[1:2])
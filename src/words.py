@@ -0,0 +1,95 @@
+import re
+import numpy as np
+import pandas as pd
+from collections import Counter
+from store import load_index
+
+# Chat filler and common Hinglish/Urdu terms, as used by the NLP notebook
+STOPWORDS = {
+    'the', 'is', 'in', 'to', 'and', 'a', 'of', 'for', 'it', 'i', 'you', 'my', 'that', 'on', 'with', 'this', 'be', 'at',
+    'media', 'omitted', 'image', 'video', 'sticker', 'gif', 'lol', 'ok', 'okay', 'yeah', 'yes', 'no', 'haha', 'message',
+    'deleted', 'hai', 'ki', 'ke', 'ka', 'se', 'ko', 'aur', 'mai', 'bhi', 'tha', 'nahi', 'kya', 'kar', 'ho', 'ab', 'wo',
+}
+# Words shorter than this are not counted
+MIN_WORD_LENGTH = 3
+
+COLUMNS = ['Author', 'Month', 'Word', 'Count']
+_NON_LETTERS = re.compile(r'[^a-z\s]')
+
+def count_words(text):
+    """
+    Counts the words of `text`, lowercased with everything but a-z removed,
+    without stopwords and short words.
+    """
+    counts = Counter(_NON_LETTERS.sub('', text.lower()).split())
+    return Counter({w: n for w, n in counts.items() if len(w) >= MIN_WORD_LENGTH and w not in STOPWORDS})
+
+class WordIndex:
+    """
+    Word counts per (Author, Month, Word), Month being 'YYYY-MM' (None for
+    undated messages). Like ChatTotals, indexes of disjoint slices of a chat
+    add up, so word clouds and keyword charts for any author or date filter
+    are read from here instead of re-tokenizing the message text.
+    """
+    def __init__(self, counts=None):
+        if counts is None:
+            counts = pd.DataFrame({c: pd.Series(dtype='int64' if c == 'Count' else object) for c in COLUMNS})
+        self.counts = counts
+
+    @classmethod
+    def from_frame(cls, df):
+        """Counts the words of a parsed chat DataFrame."""
+        dt = df['DateTime']
+        month_codes = (dt.dt.year * 100 + dt.dt.month).fillna(-1).astype('int64')
+        # Counting one joined text per (author, month) keeps the work in C
+        groups = df['Message'].astype(str).groupby([df['Author'], month_codes], sort=False)
+        rows = []
+        for (author, month), messages in groups:
+            for word, n in count_words('\n'.join(messages)).items():
+                rows.append((author, month, word, n))
+        counts = pd.DataFrame(rows, columns=COLUMNS)
+
+        # Convert each distinct month code once
+        codes = counts['Month'].unique()
+        labels = {m: f"{m // 100}-{m % 100:02d}" if m >= 0 else None for m in codes}
+        counts['Month'] = counts['Month'].map(labels).astype(object)
+        return cls(counts[COLUMNS].astype({'Count': 'int64'}))
+
+    @classmethod
+    def load(cls, path):
+        """The index saved with the chat store at `path` (empty if there is none)."""
+        counts = load_index(path, 'words')
+        return cls() if counts is None else cls(counts[COLUMNS])
+
+    def __add__(self, other):
+        counts = pd.concat([self.counts, other.counts], ignore_index=True)
+        counts = counts.groupby(['Author', 'Month', 'Word'], sort=False, dropna=False)['Count'].sum()
+        return WordIndex(counts.reset_index()[COLUMNS])
+
+    def drop_authors(self, names):
+        """Returns the index without the given authors."""
+        return WordIndex(self.counts[~self.counts['Author'].isin(names)].reset_index(drop=True))
+
+    def frequencies(self, authors=None, start=None, end=None):
+        """
+        Word -> count for the given authors and the months from `start` to
+        `end` inclusive ('YYYY-MM'; None for no bound), most used first.
+        """
+        counts = self.counts
+        mask = np.ones(len(counts), dtype=bool)
+        if authors is not None:
+            mask &= counts['Author'].isin(authors).to_numpy()
+        if start is not None or end is not None:
+            months = counts['Month']
+            dated = months.notna()
+            if start is not None:
+                dated &= months.fillna('') >= start
+            if end is not None:
+                dated &= months.fillna('') <= end
+            mask &= dated.to_numpy()
+        totals = counts[mask].groupby('Word', sort=False)['Count'].sum()
+        return totals.sort_values(ascending=False, kind='stable')
+
+    def top_words(self, top=20, **filters):
+        """The `top` most used words as a (Word, Count) DataFrame."""
+        return self.frequencies(**filters).head(top).reset_index()